@@ -0,0 +1,214 @@
+# Campus Treasure Hunt - gameplay analytics
+# Aggregates the JSON Lines event logs written by game.py in bounded memory
+
+import argparse
+import json
+import os
+from collections import Counter, defaultdict
+from multiprocessing import Pool
+
+from game import DIFFICULTY_LEVELS, EVENT_LOG_FILE
+
+CHUNK_BYTES = 64 * 1024 * 1024
+
+# Funnel stages as (label, event, field, value); a session reaches a stage
+# when it emits a matching event
+FUNNEL_STAGES = [
+    ('Started a game', 'start', None, None),
+    ('Picked up student card', 'take', 'item', 'student_card'),
+    ('Entered campus', 'achievement', 'achievement', 'entered_campus'),
+    ('Reached Fisher Library', 'move', 'location', 'Fisher Library'),
+    ('Found the notes', 'take', 'item', 'COMP9001 notes')
+]
+
+class EventStats:
+    """Running totals over a stream of events
+
+    Everything is kept as counters keyed by location, item, difficulty or
+    value, so memory depends on the size of the campus and not on the
+    number of events. Partial results from separate chunks can be merged.
+    """
+    def __init__(self):
+        self.events = 0
+        self.malformed = 0
+        self.visits = Counter()
+        self.first_visits = Counter()
+        self.pickups = Counter()
+        self.funnel = Counter()
+        self.games = Counter()
+        self.outcomes = defaultdict(Counter)
+        self.hint_games = Counter()
+        self.hints_used = Counter()
+        self.steps = defaultdict(Counter)
+        self.seconds = defaultdict(Counter)
+
+    def add(self, record):
+        """Fold one event into the totals"""
+        self.events += 1
+        event = record.get('event')
+        difficulty = record.get('difficulty')
+
+        for label, stage_event, field, value in FUNNEL_STAGES:
+            if event == stage_event and (field is None or record.get(field) == value):
+                # Later visits to a location do not count again
+                if event != 'move' or record.get('first_visit'):
+                    self.funnel[label] += 1
+
+        if event == 'move':
+            self.visits[record['location']] += 1
+            if record.get('first_visit'):
+                self.first_visits[record['location']] += 1
+        elif event == 'start':
+            self.visits[record['location']] += 1
+        elif event == 'take':
+            self.pickups[record['item']] += 1
+        elif event == 'end':
+            self.games[difficulty] += 1
+            self.outcomes[difficulty][record['outcome']] += 1
+            if record['hints_used'] > 0:
+                self.hint_games[difficulty] += 1
+            self.hints_used[difficulty] += record['hints_used']
+            self.steps[difficulty][record['steps']] += 1
+            self.seconds[difficulty][record['seconds']] += 1
+
+    def merge(self, other):
+        """Add the totals of another EventStats into this one"""
+        self.events += other.events
+        self.malformed += other.malformed
+        for name in ('visits', 'first_visits', 'pickups', 'funnel', 'games', 'hint_games', 'hints_used'):
+            getattr(self, name).update(getattr(other, name))
+        for name in ('outcomes', 'steps', 'seconds'):
+            mine = getattr(self, name)
+            for key, counts in getattr(other, name).items():
+                mine[key].update(counts)
+        return self
+
+    def report(self):
+        """Return the aggregated results as a JSON-serializable dictionary"""
+        per_difficulty = {}
+        for difficulty in sorted(self.games):
+            games = self.games[difficulty]
+            per_difficulty[difficulty] = {
+                'games': games,
+                'outcomes': dict(self.outcomes[difficulty]),
+                'hint_usage_rate': self.hint_games[difficulty] / games,
+                'hints_per_game': self.hints_used[difficulty] / games,
+                'steps': distribution(self.steps[difficulty]),
+                'seconds': distribution(self.seconds[difficulty])
+            }
+        return {
+            'events': self.events,
+            'malformed_lines': self.malformed,
+            'visits': dict(self.visits.most_common()),
+            'first_visits': dict(self.first_visits.most_common()),
+            'pickups': dict(self.pickups.most_common()),
+            'funnel': [(label, self.funnel[label]) for label, _, _, _ in FUNNEL_STAGES],
+            'difficulties': per_difficulty
+        }
+
+def distribution(histogram):
+    """Summarize a value -> count histogram with its mean and percentiles"""
+    total = sum(histogram.values())
+    if not total:
+        return {}
+    summary = {'mean': sum(value * count for value, count in histogram.items()) / total}
+    targets = [(50, 'p50'), (90, 'p90'), (99, 'p99')]
+    seen = 0
+    for value in sorted(histogram):
+        seen += histogram[value]
+        while targets and seen * 100 >= targets[0][0] * total:
+            summary[targets.pop(0)[1]] = value
+    summary['min'] = min(histogram)
+    summary['max'] = max(histogram)
+    return summary
+
+def split_log(path, chunk_bytes=CHUNK_BYTES):
+    """Yield (path, start, end) byte ranges covering a log file"""
+    size = os.path.getsize(path)
+    for start in range(0, size, chunk_bytes):
+        yield path, start, min(start + chunk_bytes, size)
+
+def read_chunk(path, start, end):
+    """Yield the lines that begin inside a byte range of a log file"""
+    with open(path, 'rb') as f:
+        if start > 0:
+            # The line running across start belongs to the previous chunk
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line
+
+def aggregate_chunk(chunk):
+    """Aggregate the events of one byte range"""
+    stats = EventStats()
+    for line in read_chunk(*chunk):
+        try:
+            stats.add(json.loads(line))
+        except (ValueError, KeyError, TypeError):
+            stats.malformed += 1
+    return stats
+
+def aggregate(paths, processes=1, chunk_bytes=CHUNK_BYTES):
+    """Aggregate event logs, optionally fanning chunks out over worker processes"""
+    chunks = (chunk for path in paths for chunk in split_log(path, chunk_bytes))
+    total = EventStats()
+    if processes <= 1:
+        for chunk in chunks:
+            total.merge(aggregate_chunk(chunk))
+        return total
+
+    with Pool(processes) as pool:
+        # Chunks are byte ranges, so workers read the files themselves
+        for stats in pool.imap_unordered(aggregate_chunk, chunks):
+            total.merge(stats)
+    return total
+
+def print_report(report):
+    """Print an aggregated report in a readable form"""
+    print(f"Events: {report['events']} ({report['malformed_lines']} malformed lines skipped)")
+
+    print("\nVisits per location:")
+    for location, count in report['visits'].items():
+        print(f"  {location}: {count} ({report['first_visits'].get(location, 0)} first visits)")
+
+    print("\nItem pickups:")
+    for item, count in report['pickups'].items():
+        print(f"  {item}: {count}")
+
+    print("\nFunnel:")
+    started = report['funnel'][0][1]
+    for label, count in report['funnel']:
+        share = f"{count / started:.1%}" if started else "-"
+        print(f"  {label}: {count} ({share})")
+
+    for difficulty, details in report['difficulties'].items():
+        print(f"\n{difficulty.capitalize()} ({details['games']} games):")
+        print("  Outcomes: " + ", ".join(f"{outcome} {count}" for outcome, count in details['outcomes'].items()))
+        print(f"  Hint usage rate: {details['hint_usage_rate']:.1%} "
+              f"({details['hints_per_game']:.2f} of {DIFFICULTY_LEVELS[difficulty]['hints']} hints per game)")
+        for name in ('steps', 'seconds'):
+            summary = details[name]
+            print(f"  {name.capitalize()}: mean {summary['mean']:.1f}, p50 {summary['p50']}, "
+                  f"p90 {summary['p90']}, p99 {summary['p99']}, max {summary['max']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate Campus Treasure Hunt event logs")
+    parser.add_argument('logs', nargs='*', default=[EVENT_LOG_FILE], help="JSON Lines event logs")
+    parser.add_argument('--processes', type=int, default=1, help="worker processes to fan chunks out to")
+    parser.add_argument('--chunk-mb', type=int, default=CHUNK_BYTES // (1024 * 1024))
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = aggregate(args.logs, args.processes, args.chunk_mb * 1024 * 1024).report()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,35 @@
 # Campus Treasure Hunt
 # A text-based adventure game where players search for lost notes in a virtual campus
 
+import argparse
 import json
+import mmap
 import os
+import sqlite3
+import struct
+import sys
+import threading
 import time
+import tracemalloc
+import uuid
 from datetime import datetime
 from enum import Enum
 
 # Game configuration
 GAME_VERSION = "1.2.0"
 SAVE_FILE = "game_save.json"
+LEADERBOARD_FILE = "leaderboard.db"
+EVENT_LOG_FILE = "events.jsonl"
+SCRIPT_OUTPUT_BUFFER = 1 << 16  # Bytes of output buffered when running a command script
 DIFFICULTY_LEVELS = {
     'easy': {'time_limit': 0, 'hints': 3, 'score_multiplier': 1.0},
     'normal': {'time_limit': 600, 'hints': 2, 'score_multiplier': 1.5},
     'hard': {'time_limit': 300, 'hints': 1, 'score_multiplier': 2.0}
 }
 
+# Source of game time; simulations replace it with a virtual clock
+clock = time.time
+
 # Game states
 class GameState(Enum):
     CONTINUE = 'continue'
@@ -52,17 +66,139 @@ class ItemType(Enum):
     FUN = 'fun'        # Fun/immersion items
     QUEST = 'quest'    # Quest chain items
 
-# Game map data
+# Text catalogs: catalogs/<language>.json is compiled to catalogs/<language>.cat on first use
+CATALOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalogs")
+DEFAULT_LANGUAGE = "en"
+CATALOG_MAGIC = b"CTHC"
+CATALOG_HEADER = struct.Struct("<4sI")  # magic, number of messages
+CATALOG_ENTRY = struct.Struct("<IIII")  # message ID offset and length, text offset and length
+# Language used for game text; missing messages fall back to English
+language = os.environ.get("CAMPUS_LANGUAGE", DEFAULT_LANGUAGE)
+
+def build_catalog(source_path):
+    """Compile a JSON catalog of message ID -> text into the indexed binary format
+
+    Texts may be given as a list of lines. The index is sorted by message
+    ID so readers can binary search it without touching unused texts.
+    """
+    with open(source_path, 'r', encoding='utf-8') as f:
+        messages = json.load(f)
+    message_ids = sorted(message_id.encode() for message_id in messages)
+    data_start = CATALOG_HEADER.size + CATALOG_ENTRY.size * len(message_ids)
+    index = bytearray()
+    data = bytearray()
+    for message_id in message_ids:
+        message = messages[message_id.decode()]
+        encoded = ("\n".join(message) if isinstance(message, list) else message).encode()
+        index += CATALOG_ENTRY.pack(data_start + len(data), len(message_id),
+                                    data_start + len(data) + len(message_id), len(encoded))
+        data += message_id + encoded
+    return CATALOG_HEADER.pack(CATALOG_MAGIC, len(message_ids)) + index + data
+
+def compile_catalog(source_path, target_path):
+    """Compile a JSON catalog into a binary file that processes can map"""
+    compiled = build_catalog(source_path)
+    # Other processes may be reading the old file, so replace it atomically
+    temporary_path = f"{target_path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_path, 'wb') as f:
+            f.write(compiled)
+        os.replace(temporary_path, target_path)
+    except OSError:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+class TextCatalog:
+    """Read-only, memory-mapped view of one language's compiled catalog
+
+    Processes mapping the same file share its pages through the page
+    cache. Each text is decoded the first time it is asked for.
+    """
+    def __init__(self, path=None, compiled=None):
+        if path is not None:
+            with open(path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._map = compiled  # Built in memory when the catalog cannot be written out
+        magic, self._count = CATALOG_HEADER.unpack_from(self._map)
+        if magic != CATALOG_MAGIC:
+            raise ValueError(f"{path} is not a compiled text catalog")
+        self._texts = {}
+
+    def get(self, message_id):
+        """Return the text of a message, or None if the catalog does not have it"""
+        if message_id not in self._texts:
+            self._texts[message_id] = self._find(message_id.encode())
+        return self._texts[message_id]
+
+    def _find(self, wanted):
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            id_offset, id_length, text_offset, text_length = CATALOG_ENTRY.unpack_from(
+                self._map, CATALOG_HEADER.size + middle * CATALOG_ENTRY.size)
+            message_id = self._map[id_offset:id_offset + id_length]
+            if message_id == wanted:
+                return self._map[text_offset:text_offset + text_length].decode()
+            if message_id < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+def load_catalog(language_code):
+    """Return a language's catalog, or None if there is none
+
+    The first call in a process recompiles the catalog if its JSON source
+    is newer than the compiled file. The catalog is then kept for the life
+    of the process, so edits to the source show up after a restart.
+    """
+    if language_code in _catalogs:
+        return _catalogs[language_code]
+    with _catalogs_lock:
+        if language_code not in _catalogs:
+            source_path = os.path.join(CATALOG_DIR, language_code + ".json")
+            compiled_path = os.path.join(CATALOG_DIR, language_code + ".cat")
+            catalog = None
+            if os.path.exists(source_path):
+                try:
+                    stale = os.path.getmtime(compiled_path) < os.path.getmtime(source_path)
+                except OSError:
+                    stale = True
+                try:
+                    if stale:
+                        compile_catalog(source_path, compiled_path)
+                    catalog = TextCatalog(compiled_path)
+                except OSError:
+                    # catalogs/ is read-only: this process keeps its own copy in memory
+                    catalog = TextCatalog(compiled=build_catalog(source_path))
+            elif os.path.exists(compiled_path):
+                catalog = TextCatalog(compiled_path)
+            _catalogs[language_code] = catalog
+        return _catalogs[language_code]
+
+def text(message_id, default=None):
+    """Return a message in the current language, falling back to English, then to default or the ID"""
+    for language_code in (language, DEFAULT_LANGUAGE):
+        catalog = load_catalog(language_code)
+        message = catalog.get(message_id) if catalog is not None else None
+        if message is not None:
+            return message
+    return message_id if default is None else default
+
+# Game map data; location and item texts are in the text catalogs under
+# location.<name>, item.<name>.description and item.<name>.usage
 map_data = {
     'University Entrance': {
-        'DESCRIPTION': "You are at the main entrance of the University of Sydney. The iconic Quadrangle stands before you. A security guard is checking student IDs at the gate.",
         'EXITS': {'north': 'Quadrangle', 'east': 'Wentworth Building', 'west': 'Fisher Library'},
         'ITEMS': ['student_card'],
         'SPECIAL': {
             'student_card': {
-                'description': "Your University of Sydney student ID card with your name and student number.",
                 'required': True,
-                'usage': "Required for access to university facilities",
                 'type': ItemType.ACCESS
             }
         },
@@ -72,20 +208,15 @@ map_data = {
         }
     },
     'Quadrangle': {
-        'DESCRIPTION': "You are in the Main Quadrangle, the heart of the university. The Great Hall stands to the north, with MacLaurin Hall to the east. The old sandstone walls surround you.",
         'EXITS': {'north': 'Great Hall', 'east': 'MacLaurin Hall', 'south': 'University Entrance', 'west': 'Fisher Library'},
         'ITEMS': ['lecture_notes', 'university_guide', 'mysterious_note'],
         'SPECIAL': {
             'lecture_notes': {
-                'description': "Some lecture notes from a previous class.",
                 'required': False,
-                'usage': "Contains useful academic information",
                 'type': ItemType.INFO
             },
             'mysterious_note': {
-                'description': "A torn piece of paper clinging to the sandstone wall. It seems to have been here for a while.",
                 'required': False,
-                'usage': "Read the mysterious note",
                 'type': ItemType.QUEST
             }
         },
@@ -95,226 +226,272 @@ map_data = {
         }
     },
     'Great Hall': {
-        'DESCRIPTION': "You are in the magnificent Great Hall, with its beautiful stained glass windows and grand architecture.",
         'EXITS': {'south': 'Quadrangle'},
         'ITEMS': ['graduation_gown'],
         'SPECIAL': {
             'graduation_gown': {
-                'description': "A graduation gown, symbolizing academic achievement.",
-                'required': False,
-                'usage': "Worn during graduation ceremonies"
+                'required': False
             }
         }
     },
     'MacLaurin Hall': {
-        'DESCRIPTION': "You are in MacLaurin Hall, known for its impressive architecture and academic atmosphere.",
         'EXITS': {'west': 'Quadrangle', 'east': 'Chau Chak Wing Museum'},
         'ITEMS': ['library_card'],
         'SPECIAL': {
             'library_card': {
-                'description': "A library access card for Fisher Library.",
-                'required': True,
-                'usage': "Required to access Fisher Library"
+                'required': True
             }
         }
     },
     'Chau Chak Wing Museum': {
-        'DESCRIPTION': "You are in the Chau Chak Wing Museum, home to the university's art and antiquities collections.",
         'EXITS': {'west': 'MacLaurin Hall'},
         'ITEMS': ['museum_guide', ''
                                   ''
                                   'ancient_artifact'],
         'SPECIAL': {
             'museum_guide': {
-                'description': "A guide to the museum's collections.",
-                'required': False,
-                'usage': "Helps understand museum exhibits"
+                'required': False
             }
         }
     },
     'Fisher Library': {
-        'DESCRIPTION': "You are in Fisher Library, the main university library. A 'lost COMP9001 notes' lies on a study desk.",
         'EXITS': {'east': 'Quadrangle', 'south': 'University Entrance', 'north': 'Law Library'},
         'ITEMS': ['COMP9001 notes', 'textbook', 'research_paper'],
         'SPECIAL': {
             'COMP9001 notes': {
-                'description': "The lost COMP9001 notes you've been searching for.",
-                'required': True,
-                'usage': "Contains important course material"
+                'required': True
             }
         }
     },
     'Law Library': {
-        'DESCRIPTION': "You are in the Law Library, a quiet space for legal research.",
         'EXITS': {'south': 'Fisher Library'},
         'ITEMS': ['law_book'],
         'SPECIAL': {
             'law_book': {
-                'description': "A comprehensive law textbook.",
-                'required': False,
-                'usage': "Contains legal information"
+                'required': False
             }
         }
     },
     'Wentworth Building': {
-        'DESCRIPTION': "You are in the Wentworth Building, home to student services and food outlets.",
         'EXITS': {'west': 'University Entrance', 'north': 'Manning House'},
         'ITEMS': ['student_discount_card', 'cafeteria_menu', 'campus_map'],
         'SPECIAL': {
             'student_discount_card': {
-                'description': "A card offering student discounts at campus outlets.",
-                'required': False,
-                'usage': "Gives access to student discounts"
+                'required': False
             },
             'campus_map': {
-                'description': "A detailed map of the University of Sydney campus.",
                 'required': False,
-                'usage': "Helps navigate the campus",
                 'type': ItemType.INFO
             }
         }
     },
     'Manning House': {
-        'DESCRIPTION': "You are in Manning House, a hub for student activities and organizations.",
         'EXITS': {'south': 'Wentworth Building'},
         'ITEMS': ['club_membership'],
         'SPECIAL': {
             'club_membership': {
-                'description': "A membership card for a student club.",
-                'required': False,
-                'usage': "Gives access to club activities"
+                'required': False
             }
         }
     },
     'Engineering Precinct': {
-        'DESCRIPTION': "You are in the Engineering Precinct, surrounded by the Peter Nicol Russell Building and Aeronautical Engineering Building.",
         'EXITS': {'north': 'PNR Building', 'east': 'Electrical Engineering Building', 'south': 'University Entrance'},
         'ITEMS': ['engineering_drawing', 'safety_goggles'],
         'SPECIAL': {
             'safety_goggles': {
-                'description': "Safety goggles required for engineering labs.",
-                'required': False,
-                'usage': "Protects eyes in engineering labs"
+                'required': False
             }
         }
     },
     'PNR Building': {
-        'DESCRIPTION': "You are in the Peter Nicol Russell Building, home to mechanical engineering.",
         'EXITS': {'south': 'Engineering Precinct'},
         'ITEMS': ['mechanical_tools'],
         'SPECIAL': {
             'mechanical_tools': {
-                'description': "A set of precision mechanical tools.",
-                'required': False,
-                'usage': "Used in mechanical engineering projects"
+                'required': False
             }
         }
     },
     'Electrical Engineering Building': {
-        'DESCRIPTION': "You are in the Electrical Engineering Building, filled with advanced electronics labs.",
         'EXITS': {'west': 'Engineering Precinct'},
         'ITEMS': ['circuit_board'],
         'SPECIAL': {
             'circuit_board': {
-                'description': "A prototype circuit board.",
-                'required': False,
-                'usage': "Used in electronics projects"
+                'required': False
             }
         }
     },
     'Science Precinct': {
-        'DESCRIPTION': "You are in the Science Precinct, surrounded by the Chemistry, Physics, and Madsen Buildings.",
         'EXITS': {'north': 'Chemistry Building', 'east': 'Physics Building', 'west': 'Madsen Building'},
         'ITEMS': ['lab_coat', 'scientific_calculator'],
         'SPECIAL': {
             'lab_coat': {
-                'description': "A white lab coat required for science experiments.",
-                'required': False,
-                'usage': "Protects clothing in laboratories"
+                'required': False
             }
         }
     },
     'Chemistry Building': {
-        'DESCRIPTION': "You are in the Chemistry Building, filled with laboratories and research facilities.",
         'EXITS': {'south': 'Science Precinct'},
         'ITEMS': ['chemical_notes'],
         'SPECIAL': {
             'chemical_notes': {
-                'description': "Notes from a chemistry experiment.",
-                'required': False,
-                'usage': "Contains chemical formulas and procedures"
+                'required': False
             }
         }
     },
     'Physics Building': {
-        'DESCRIPTION': "You are in the Physics Building, home to advanced physics research and teaching.",
         'EXITS': {'west': 'Science Precinct'},
         'ITEMS': ['physics_textbook'],
         'SPECIAL': {
             'physics_textbook': {
-                'description': "A comprehensive physics textbook.",
-                'required': False,
-                'usage': "Contains physics theories and formulas"
+                'required': False
             }
         }
     },
     'Madsen Building': {
-        'DESCRIPTION': "You are in the Madsen Building, known for its biological sciences research.",
         'EXITS': {'east': 'Science Precinct'},
         'ITEMS': ['microscope_slides'],
         'SPECIAL': {
             'microscope_slides': {
-                'description': "A set of prepared microscope slides.",
-                'required': False,
-                'usage': "Used for biological observations"
+                'required': False
             }
         }
     },
     'New Law Building': {
-        'DESCRIPTION': "You are in the New Law Building, a modern facility for legal education.",
         'EXITS': {'south': 'University Entrance'},
         'ITEMS': ['legal_casebook'],
         'SPECIAL': {
             'legal_casebook': {
-                'description': "A book of important legal cases.",
-                'required': False,
-                'usage': "Contains legal precedents"
+                'required': False
             }
         }
     },
     'Education Building': {
-        'DESCRIPTION': "You are in the Education Building, dedicated to teacher education and research.",
         'EXITS': {'north': 'University Entrance'},
         'ITEMS': ['teaching_plan'],
         'SPECIAL': {
             'teaching_plan': {
-                'description': "A detailed teaching lesson plan.",
-                'required': False,
-                'usage': "Guides teaching activities"
+                'required': False
             }
         }
     },
     'Sydney Nanoscience Hub': {
-        'DESCRIPTION': "You are in the Sydney Nanoscience Hub, a state-of-the-art research facility.",
         'EXITS': {'south': 'University Entrance'},
         'ITEMS': ['research_proposal'],
         'SPECIAL': {
             'research_proposal': {
-                'description': "A nanotechnology research proposal.",
-                'required': False,
-                'usage': "Outlines research objectives"
+                'required': False
             }
         }
     }
 }
 
+class World:
+    """Campus locations shared by one or more game sessions
+
+    Every location has its own lock, so sessions working in different
+    locations never wait on each other. A forked world is private to one
+    session and only copies the locations whose items it changes.
+    """
+    __slots__ = ('locations', '_locks', '_views', '_layout', '_layout_lock', '_base', '_owned')
+
+    def __init__(self, locations=None, base=None):
+        self.locations = map_data if locations is None else locations
+        self._locks = {}
+        self._views = {}
+        self._layout = None
+        self._base = base
+        # Forks share their base's layout and only track what they change
+        self._layout_lock = threading.Lock() if base is None else None
+        self._owned = None if base is None else ()
+
+    def fork(self, changed_items=None):
+        """Return a private copy of this world that shares unchanged locations with it"""
+        world = World(self.locations, base=self)  # Locations are copied on the first change
+        for location_name, items in (changed_items or {}).items():
+            world._own(location_name)['ITEMS'][:] = items
+        return world
+
+    def changed_items(self):
+        """Return the items of every location a forked world has changed"""
+        return {name: list(self.locations[name]['ITEMS']) for name in self._owned or ()}
+
+    def _own(self, location_name):
+        """Give a forked world its own copy of a location before changing it"""
+        if self._owned is not None and location_name not in self._owned:
+            if self.locations is self._base.locations:
+                self.locations = dict(self.locations)
+            location = dict(self.locations[location_name])
+            location['ITEMS'] = list(location['ITEMS'])
+            self.locations[location_name] = location
+            if not self._owned:
+                self._owned = set()
+            self._owned.add(location_name)
+        return self.locations[location_name]
+
+    def lock(self, location_name):
+        """Return the lock guarding a location's items"""
+        lock = self._locks.get(location_name)
+        if lock is None:
+            lock = self._locks.setdefault(location_name, threading.Lock())
+        return lock
+
+    def invalidate_view(self, location_name):
+        """Drop the cached view of a location after its items or exits change"""
+        self._views.pop(location_name, None)
+
+    def render_location(self, location_name):
+        """Return the cached text shown when entering or looking at a location"""
+        if self._base is not None and location_name not in self._owned:
+            return self._base.render_location(location_name)
+        view = self._views.get(location_name)
+        if view is None:
+            with self.lock(location_name):
+                view = render_location_view(self.locations[location_name], location_name)
+                self._views[location_name] = view
+        return view
+
+    def return_item(self, location_name, item):
+        """Put an item back into a location"""
+        with self.lock(location_name):
+            self._own(location_name)['ITEMS'].append(item)
+            self._views.pop(location_name, None)
+
+    def take_item(self, location_name, item_name_input):
+        """Remove a matching item from a location and return its name, or None"""
+        with self.lock(location_name):
+            for item in self.locations[location_name]['ITEMS']:
+                if item.lower().replace('_', ' ') == item_name_input:
+                    self._own(location_name)['ITEMS'].remove(item)
+                    self._views.pop(location_name, None)
+                    return item
+        return None
+
+    def map_layout(self):
+        """Return the cached map layout, rebuilding it if exits have changed"""
+        if self._base is not None:
+            return self._base.map_layout()  # Forks never change exits
+        layout = self._layout
+        if layout is None:
+            with self._layout_lock:
+                if self._layout is None:
+                    # Update connections before laying out the map
+                    for location_name in ensure_all_locations_connected(self.locations):
+                        self.invalidate_view(location_name)
+                    self._layout = build_map_layout(self.locations)
+                layout = self._layout
+        return layout
+
 class HintSystem:
+    # Hint texts never change, so every session shares them
+    hints = {
+        1: "Some say a torn note still clings to the corner of the old sandstone wall in the Quadrangle — as if waiting to be read.",
+        2: "Among shelves older than memory, what's forgotten may yet be found.",
+        3: "They say a student left some notes on a quiet desk in the Fisher Library... still waiting."
+    }
+    __slots__ = ('current_hint', 'mysterious_note_used')
+
     def __init__(self):
-        self.hints = {
-            1: "Some say a torn note still clings to the corner of the old sandstone wall in the Quadrangle — as if waiting to be read.",
-            2: "Among shelves older than memory, what's forgotten may yet be found.",
-            3: "They say a student left some notes on a quiet desk in the Fisher Library... still waiting."
-        }
         self.current_hint = 1
         self.mysterious_note_used = 0
 
@@ -329,6 +506,13 @@ class HintSystem:
 
 class GameStateManager:
     """Manages the game state and player progress"""
+    __slots__ = (
+        'player_location', 'player_inventory', 'game_start_time', 'time_limit', 'remaining_hints',
+        'difficulty', 'required_items', 'visited_locations', 'game_score', 'achievements',
+        'puzzle_solved', 'steps_taken', 'items_collected', 'start_time', 'end_time',
+        'special_events', 'quest_progress', 'hint_system', 'has_entered_campus', 'event_listeners'
+    )
+
     def __init__(self):
         self.player_location = 'University Entrance'
         self.player_inventory = []
@@ -349,6 +533,7 @@ class GameStateManager:
         self.quest_progress = {}
         self.hint_system = HintSystem()
         self.has_entered_campus = False
+        self.event_listeners = []
 
     def to_dict(self):
         """Convert game state to dictionary for saving"""
@@ -403,20 +588,44 @@ class GameStateManager:
         state.has_entered_campus = data['has_entered_campus']
         return state
 
+    def time_is_up(self):
+        """Check whether the difficulty's time limit has run out"""
+        return self.time_limit > 0 and clock() - self.start_time > self.time_limit
+
+    def final_score(self):
+        """Score with the difficulty multiplier applied"""
+        return int(self.game_score * DIFFICULTY_LEVELS[self.difficulty]['score_multiplier'])
+
+    def emit(self, event, **details):
+        """Notify event listeners of something that happened in this session"""
+        for listener in self.event_listeners:
+            listener(self, event, details)
+
     def add_achievement(self, achievement_type):
         """Add an achievement and update score"""
         if achievement_type not in self.achievements:
             self.achievements.add(achievement_type)
             self.game_score += 100  # Achievement bonus
+            self.emit('achievement', achievement=achievement_type.value)
+
+    def emit_end(self, outcome):
+        """Notify event listeners that the game ended"""
+        self.emit('end', outcome=outcome.value, score=self.final_score(),
+                  steps=self.steps_taken, seconds=int(clock() - self.start_time),
+                  hints_used=DIFFICULTY_LEVELS[self.difficulty]['hints'] - self.remaining_hints,
+                  items=self.items_collected)
 
-    def check_achievements(self):
+    def check_achievements(self, locations=None):
         """Check and award achievements based on current progress"""
+        if locations is None:
+            locations = map_data
+
         # Check for visiting all locations
-        if len(self.visited_locations) == len(map_data):
+        if len(self.visited_locations) == len(locations):
             self.add_achievement(AchievementType.VISITED_ALL_LOCATIONS)
 
         # Check for collecting all items
-        total_items = sum(len(location['ITEMS']) for location in map_data.values())
+        total_items = sum(len(location['ITEMS']) for location in locations.values())
         if self.items_collected == total_items:
             self.add_achievement(AchievementType.COLLECTED_ALL_ITEMS)
 
@@ -430,13 +639,15 @@ class GameStateManager:
         if self.remaining_hints == DIFFICULTY_LEVELS[self.difficulty]['hints']:
             self.add_achievement(AchievementType.NO_HINTS_USED)
 
-    def check_access(self, location):
+    def check_access(self, location, locations=None):
         """Check if player has required items to access a location"""
-        if 'ACCESS_CONTROL' in map_data[location]:
-            required = map_data[location]['ACCESS_CONTROL']['required_items']
+        if locations is None:
+            locations = map_data
+        if 'ACCESS_CONTROL' in locations[location]:
+            required = locations[location]['ACCESS_CONTROL']['required_items']
             for item in required:
                 if item not in self.player_inventory:
-                    print(map_data[location]['ACCESS_CONTROL']['denied_message'])
+                    print(locations[location]['ACCESS_CONTROL']['denied_message'])
                     return False
         return True
 
@@ -464,32 +675,245 @@ class GameStateManager:
                 return True
         return False
 
+class EventLog:
+    """Appends the events of one session to a JSON Lines file"""
+    def __init__(self, path=EVENT_LOG_FILE, session_id=None):
+        self.file = open(path, 'a', buffering=1 << 16)
+        self.session_id = session_id or uuid.uuid4().hex
+
+    def __call__(self, state, event, details):
+        record = {
+            'ts': round(clock(), 3),
+            'session': self.session_id,
+            'difficulty': state.difficulty,
+            'event': event
+        }
+        record.update(details)
+        self.file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self.file.close()
+
+# Commands that can always be undone; older snapshots are forgotten in batches
+MAX_UNDO_STEPS = 200
+
+# GameStateManager fields restored by undo; timing fields keep running
+SNAPSHOT_FIELDS = (
+    'player_location', 'player_inventory', 'time_limit', 'remaining_hints', 'difficulty',
+    'visited_locations', 'game_score', 'achievements', 'puzzle_solved', 'steps_taken',
+    'items_collected', 'special_events', 'quest_progress', 'hint_system', 'has_entered_campus'
+)
+
+_EMPTY_FROZENSET = frozenset()
+
+def _freeze(field, value):
+    """Return an immutable copy of a state field"""
+    if field == 'hint_system':
+        return (value.current_hint, value.mysterious_note_used)
+    if isinstance(value, list):
+        return tuple(value)
+    if isinstance(value, set):
+        return frozenset(value) if value else _EMPTY_FROZENSET
+    if isinstance(value, dict):
+        return tuple(value.items())
+    return value
+
+def _matches(field, value, frozen):
+    """Check a live state field against its frozen copy without copying it"""
+    if field == 'hint_system':
+        return (value.current_hint, value.mysterious_note_used) == frozen
+    if isinstance(value, list):
+        return len(value) == len(frozen) and all(a == b for a, b in zip(value, frozen))
+    if isinstance(value, dict):
+        return len(value) == len(frozen) and all(value.get(k, frozen) == v for k, v in frozen)
+    return value == frozen
+
+def _thaw(field, frozen, state):
+    """Write a frozen field back onto a state"""
+    if field == 'hint_system':
+        state.hint_system.current_hint, state.hint_system.mysterious_note_used = frozen
+    elif isinstance(frozen, tuple) and field != 'quest_progress':
+        setattr(state, field, list(frozen))
+    elif isinstance(frozen, frozenset):
+        setattr(state, field, set(frozen))
+    elif field == 'quest_progress':
+        setattr(state, field, dict(frozen))
+    else:
+        setattr(state, field, frozen)
+
+class StateSnapshot:
+    """An immutable point in a session's history
+
+    Snapshots form a linked list back to the start of the game. Field
+    values that did not change are shared with the parent snapshot rather
+    than copied. taken lists the (location, item) pairs picked up by the
+    command that led here, so undo can put them back into the world.
+    """
+    __slots__ = ('parent', 'depth', 'values', 'taken')
+
+    def __init__(self, parent, values, taken=()):
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent else 0
+        self.values = values
+        self.taken = taken
+
+class StateHistory:
+    """Undo history of one session, built from structurally shared snapshots"""
+    __slots__ = ('head', 'oldest_depth', 'pending_taken')
+
+    def __init__(self, state):
+        self.head = StateSnapshot(None, tuple(_freeze(f, getattr(state, f)) for f in SNAPSHOT_FIELDS))
+        self.oldest_depth = 0
+        self.pending_taken = []
+
+    def taken(self, location_name, item):
+        """Note an item removed from the world by the command being run"""
+        self.pending_taken.append((location_name, item))
+
+    def record(self, state):
+        """Snapshot the state after a command, if the command changed it"""
+        taken = tuple(self.pending_taken)
+        self.pending_taken.clear()
+        previous = self.head.values
+        values = None
+        for index, field in enumerate(SNAPSHOT_FIELDS):
+            value = getattr(state, field)
+            if not _matches(field, value, previous[index]):
+                if values is None:
+                    values = list(previous)
+                values[index] = _freeze(field, value)
+        if values is None:
+            return False
+
+        self.head = StateSnapshot(self.head, tuple(values), taken)
+        if self.head.depth - self.oldest_depth >= 2 * MAX_UNDO_STEPS:
+            # Cut the chain MAX_UNDO_STEPS back so older snapshots can be freed
+            oldest = self.head
+            for _ in range(MAX_UNDO_STEPS):
+                oldest = oldest.parent
+            oldest.parent = None
+            self.oldest_depth = oldest.depth
+        return True
+
+    def rewind(self, state, world, steps=None):
+        """Restore the state from steps snapshots back, or from the oldest kept; return the number undone"""
+        target = self.head
+        undone = 0
+        while target.parent is not None and (steps is None or undone < steps):
+            for location_name, item in target.taken:
+                world.return_item(location_name, item)
+            target = target.parent
+            undone += 1
+        if not undone:
+            return 0
+
+        for field, frozen in zip(SNAPSHOT_FIELDS, target.values):
+            _thaw(field, frozen, state)
+        self.head = target
+        return undone
+
+class Leaderboard:
+    """Persistent scores of completed games, ranked per difficulty
+
+    Entries are kept in SQLite with an index on (difficulty, score), so
+    inserts and top-K queries are O(log n). A per-difficulty histogram of
+    scores answers rank queries without visiting the entries ranked above.
+    """
+    def __init__(self, path=LEADERBOARD_FILE):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                player TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                steps INTEGER NOT NULL,
+                seconds INTEGER NOT NULL,
+                achievements TEXT NOT NULL,
+                finished_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_by_score ON entries (difficulty, score DESC, id);
+            CREATE TABLE IF NOT EXISTS score_counts (
+                difficulty TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (difficulty, score)
+            ) WITHOUT ROWID;
+        """)
+
+    def close(self):
+        self.connection.close()
+
+    def record(self, player, state):
+        """Store a completed game and return its rank"""
+        score = state.final_score()
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO entries (player, difficulty, score, steps, seconds, achievements, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (player, state.difficulty, score, state.steps_taken,
+                 int(state.end_time - state.start_time),
+                 ",".join(sorted(a.value for a in state.achievements)),
+                 datetime.now().isoformat(timespec='seconds'))
+            )
+            self.connection.execute(
+                "INSERT INTO score_counts (difficulty, score, count) VALUES (?, ?, 1) "
+                "ON CONFLICT (difficulty, score) DO UPDATE SET count = count + 1",
+                (state.difficulty, score)
+            )
+        return self.rank(state.difficulty, score)
+
+    def top(self, difficulty, k=10):
+        """Return the k best entries as (player, score, steps, seconds, achievements) rows"""
+        return self.connection.execute(
+            "SELECT player, score, steps, seconds, achievements FROM entries "
+            "WHERE difficulty = ? ORDER BY score DESC, id LIMIT ?",
+            (difficulty, k)
+        ).fetchall()
+
+    def rank(self, difficulty, score):
+        """Return the rank a score holds, counting ties as the same rank"""
+        above = self.connection.execute(
+            "SELECT COALESCE(SUM(count), 0) FROM score_counts WHERE difficulty = ? AND score > ?",
+            (difficulty, score)
+        ).fetchone()[0]
+        return above + 1
+
+    def size(self, difficulty):
+        """Return the number of completed games at a difficulty"""
+        return self.connection.execute(
+            "SELECT COALESCE(SUM(count), 0) FROM score_counts WHERE difficulty = ?",
+            (difficulty,)
+        ).fetchone()[0]
+
 class GameCommands:
     """Handles all game commands and their execution"""
-    def __init__(self, game_state):
+    __slots__ = ('state', 'world', 'history', 'save_path')
+
+    def __init__(self, game_state, world=None, save_path=SAVE_FILE):
         self.state = game_state
-        self.commands = {
-            'go': self.go,
-            'look': self.look,
-            'take': self.take,
-            'inventory': self.inventory,
-            'quit': self.quit,
-            'help': self.help,
-            'save': self.save,
-            'load': self.load,
-            'hint': self.hint,
-            'use': self.use,
-            'examine': self.examine,
-            'score': self.score,
-            'achievements': self.achievements,
-            'stats': self.stats,
-            'time': self.time,
-            'difficulty': self.difficulty,
-            'map': self.show_map
-        }
+        self.world = world or default_world
+        # Achievements held from the start belong to the first snapshot, so undo never takes them back
+        game_state.check_achievements(self.world.locations)
+        self.history = StateHistory(game_state)
+        self.save_path = save_path
 
     def process(self, command_input):
-        """Process player input and execute corresponding command"""
+        """Process player input and execute corresponding command, then check achievements
+
+        Commands chained with ';' run in order until one ends the game or
+        time runs out, and the status of the last one run is returned.
+        """
+        chain = [part for part in command_input.split(';') if part.strip()]
+        if len(chain) > 1:
+            for part in chain:
+                status = self.process(part)
+                if status in (GameState.WIN, GameState.LOSE, GameState.QUIT) or self.state.time_is_up():
+                    break
+            return status
+        if chain:
+            command_input = chain[0].strip()
+
         normalized_command = command_input.lower()
         words = normalized_command.split()
         
@@ -499,7 +923,12 @@ class GameCommands:
         
         verb = words[0]
         if verb in self.commands:
-            return self.commands[verb](words[1:] if len(words) > 1 else [])
+            status = self.commands[verb](self, words[1:] if len(words) > 1 else [])
+            if verb not in ('undo', 'rewind'):
+                # Award achievements before the snapshot so undo keeps them with the command that earned them
+                self.state.check_achievements(self.world.locations)
+                self.history.record(self.state)
+            return status
         else:
             print(f"I don't understand '{command_input}'. Type 'help' for available commands.")
             return GameState.CONTINUE
@@ -511,16 +940,20 @@ class GameCommands:
             return GameState.CONTINUE
         
         direction = args[0]
-        current_exits = map_data[self.state.player_location]['EXITS']
+        current_exits = self.world.locations[self.state.player_location]['EXITS']
         
         if direction in current_exits:
             next_location = current_exits[direction]
-            if self.state.check_access(next_location):
+            if self.state.check_access(next_location, self.world.locations):
+                previous_location = self.state.player_location
+                first_visit = next_location not in self.state.visited_locations
                 self.state.player_location = next_location
                 self.state.visited_locations.add(next_location)
                 self.state.game_score += 10
                 self.state.steps_taken += 1
-                display_location(self.state.player_location)
+                self.state.emit('move', location=next_location, previous=previous_location,
+                                first_visit=first_visit)
+                display_location(self.state.player_location, self.world)
             else:
                 return GameState.ACCESS_DENIED
         else:
@@ -529,7 +962,7 @@ class GameCommands:
 
     def look(self, args):
         """Display current location information"""
-        display_location(self.state.player_location)
+        display_location(self.state.player_location, self.world)
         return GameState.CONTINUE
 
     def take(self, args):
@@ -539,25 +972,20 @@ class GameCommands:
             return GameState.CONTINUE
         
         item_name_input = " ".join(args).replace('_', ' ').lower()
-        items_here = map_data[self.state.player_location]['ITEMS']
-        
-        matched_item = None
-        for item in items_here:
-            if item.lower().replace('_', ' ') == item_name_input:
-                matched_item = item
-                break
+        matched_item = self.world.take_item(self.state.player_location, item_name_input)
         
         if matched_item:
-            items_here.remove(matched_item)
+            self.history.taken(self.state.player_location, matched_item)
             self.state.player_inventory.append(matched_item)
             print(f"You picked up [{matched_item}].")
             self.state.game_score += 20
             self.state.items_collected += 1
+            self.state.emit('take', item=matched_item, location=self.state.player_location)
             
             if matched_item == 'COMP9001 notes':
                 print("\nCongratulations! You found the lost COMP9001 notes! You win!")
                 self.state.add_achievement(AchievementType.FOUND_NOTES)
-                self.state.end_time = time.time()
+                self.state.end_time = clock()
                 return GameState.WIN
         else:
             print(f"There is no [{item_name_input}] here.")
@@ -578,39 +1006,7 @@ class GameCommands:
 
     def help(self, args):
         """Display help information"""
-        print("\nAvailable commands:")
-        print("  go [direction] - Move in specified direction")
-        print("  look - View current location")
-        print("  take [item] - Pick up an item")
-        print("  inventory - View inventory")
-        print("  examine [item] - Examine an item")
-        print("  use [item] - Use an item")
-        print("  save - Save game")
-        print("  load - Load game")
-        print("  hint - Get a hint")
-        print("  score - View score")
-        print("  achievements - View earned achievements")
-        print("  stats - View game statistics")
-        print("  time - View remaining time")
-        print("  difficulty [easy/normal/hard] - Set game difficulty")
-        print("  quit - Quit game")
-        
-        print("\nGame difficulty levels:")
-        print("  easy - No time limit, 3 hints available")
-        print("  normal - 10 minutes time limit, 2 hints available")
-        print("  hard - 5 minutes time limit, 1 hint available")
-        
-        print("\nAchievements:")
-        print("  Entered Campus - First time entering the university")
-        print("  Entered Library - First time entering the library")
-        print("  Found Notes - Found the lost COMP9001 notes")
-        print("  Collected All Items - Collected all available items")
-        print("  Visited All Locations - Explored all campus locations")
-        print("  Completed Under Time - Finished the game within time limit")
-        print("  No Hints Used - Completed the game without using hints")
-        print("  Explored Quad - Thoroughly explored the Quadrangle")
-        print("  Visited Museum - Explored the Chau Chak Wing Museum")
-        print("  Attended Lecture - Attended a lecture in a teaching building")
+        print(text("help"))
         return GameState.CONTINUE
 
     def difficulty(self, args):
@@ -639,7 +1035,10 @@ class GameCommands:
     def save(self, args):
         """Save game state to file"""
         try:
-            with open(SAVE_FILE, 'w') as f:
+            directory = os.path.dirname(self.save_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.save_path, 'w') as f:
                 json.dump(self.state.to_dict(), f)
             print("Game saved successfully.")
         except Exception as e:
@@ -650,16 +1049,20 @@ class GameCommands:
         """Load game state from file"""
         import json
         try:
-            if os.path.exists(SAVE_FILE):
-                with open(SAVE_FILE, 'r') as f:
+            if os.path.exists(self.save_path):
+                with open(self.save_path, 'r') as f:
                     try:
                         data = json.load(f)
                     except json.JSONDecodeError:
                         print("Error loading game: Save file is corrupted or incomplete. Please delete or reset your save file and try again.")
                         return GameState.CONTINUE
-                self.state = GameStateManager.from_dict(data)
+                loaded_state = GameStateManager.from_dict(data)
+                loaded_state.event_listeners = self.state.event_listeners
+                self.state = loaded_state
+                # Undo cannot go back past a load
+                self.history = StateHistory(loaded_state)
                 print("Game loaded successfully.")
-                display_location(self.state.player_location)
+                display_location(self.state.player_location, self.world)
             else:
                 print("No saved game found.")
         except Exception as e:
@@ -672,6 +1075,7 @@ class GameCommands:
             self.state.remaining_hints -= 1
             print(f"\nHint: {self.state.hint_system.get_hint()}")
             self.state.game_score -= 50
+            self.state.emit('hint', remaining=self.state.remaining_hints)
         else:
             print("You have used all your hints.")
         return GameState.CONTINUE
@@ -687,6 +1091,7 @@ class GameCommands:
             print(f"You don't have [{item_name}] in your inventory.")
             return GameState.CONTINUE
         
+        self.state.emit('use', item=item_name, location=self.state.player_location)
         if item_name == 'student_card':
             if not self.state.has_entered_campus:
                 print("\nYou show your student card to the security guard.")
@@ -742,10 +1147,13 @@ class GameCommands:
         
         item_name = args[0]
         if item_name in self.state.player_inventory:
-            if item_name in map_data[self.state.player_location].get('SPECIAL', {}):
-                print(map_data[self.state.player_location]['SPECIAL'][item_name]['description'])
+            current_place = self.world.locations[self.state.player_location]
+            details = current_place.get('SPECIAL', {}).get(item_name)
+            nothing_special = f"You examine [{item_name}] but find nothing special."
+            if details is not None:
+                print(details.get('description') or text(f"item.{item_name}.description", nothing_special))
             else:
-                print(f"You examine [{item_name}] but find nothing special.")
+                print(nothing_special)
         else:
             print(f"You don't have [{item_name}] in your inventory.")
         return GameState.CONTINUE
@@ -771,13 +1179,13 @@ class GameCommands:
         print(f"Steps taken: {self.state.steps_taken}")
         print(f"Items collected: {self.state.items_collected}")
         print(f"Locations visited: {len(self.state.visited_locations)}")
-        print(f"Time played: {int(time.time() - self.state.start_time)} seconds")
+        print(f"Time played: {int(clock() - self.state.start_time)} seconds")
         return GameState.CONTINUE
 
     def time(self, args):
         """Display remaining time"""
         if self.state.time_limit > 0:
-            elapsed = time.time() - self.state.start_time
+            elapsed = clock() - self.state.start_time
             remaining = self.state.time_limit - elapsed
             if remaining > 0:
                 print(f"\nTime remaining: {int(remaining)} seconds")
@@ -787,129 +1195,334 @@ class GameCommands:
             print("\nNo time limit in current difficulty.")
         return GameState.CONTINUE
 
+    def undo(self, args):
+        """Undo the last n commands that changed the game (undo [n])"""
+        steps = 1
+        if args:
+            digits = args[0].lstrip('0')
+            if not args[0].isdecimal() or not digits:
+                print("Usage: undo [number of commands]")
+                return GameState.CONTINUE
+            # More steps than the history keeps just undo everything it has
+            steps = int(digits) if len(digits) <= 4 else None
+
+        undone = self.history.rewind(self.state, self.world, steps)
+        if not undone:
+            print("There is nothing to undo.")
+            return GameState.CONTINUE
+        print(f"Undid {undone} command{'s' if undone > 1 else ''}.")
+        self.state.emit('undo', commands=undone)
+        display_location(self.state.player_location, self.world)
+        return GameState.CONTINUE
+
+    def rewind(self, args):
+        """Rewind the game to where it started, or as far back as the undo history goes"""
+        reaches_start = self.history.oldest_depth == 0
+        undone = self.history.rewind(self.state, self.world)
+        if not undone:
+            print("There is nothing to rewind.")
+            return GameState.CONTINUE
+        where = "to the start of the game" if reaches_start else "as far back as history goes"
+        print(f"Rewound {undone} command{'s' if undone > 1 else ''} {where}.")
+        self.state.emit('undo', commands=undone)
+        display_location(self.state.player_location, self.world)
+        return GameState.CONTINUE
+
+    def leaderboard(self, args):
+        """Display the best completed games for a difficulty"""
+        difficulty = args[0] if args else self.state.difficulty
+        if difficulty not in DIFFICULTY_LEVELS:
+            print("Invalid difficulty level. Use 'easy', 'normal', or 'hard'")
+            return GameState.CONTINUE
+
+        try:
+            board = Leaderboard(LEADERBOARD_FILE)
+            try:
+                entries = board.top(difficulty)
+                total = board.size(difficulty)
+                current_rank = board.rank(difficulty, self.state.final_score())
+            finally:
+                board.close()
+        except sqlite3.Error as e:
+            print(f"Error reading leaderboard: {e}")
+            return GameState.CONTINUE
+
+        print(f"\nLeaderboard ({difficulty}):")
+        if not entries:
+            print("  No completed games yet.")
+        for position, (player, score, steps, seconds, achievements) in enumerate(entries, 1):
+            print(f"  {position}. {player} - {score} points, {steps} steps, {seconds} seconds")
+        if self.state.difficulty == difficulty:
+            print(f"\nYour current score of {self.state.final_score()} would rank {current_rank} of {total + 1}")
+        return GameState.CONTINUE
+
     def show_map(self, args):
-        """Display the campus map as a 2D grid based on N/S/E/W relationships, including all locations."""
-        ensure_all_locations_connected()  # Always update connections before showing the map
+        """Display the campus map as a 2D grid around the player (map [radius|zoom|full])"""
         if 'campus_map' not in self.state.player_inventory:
             print("You need a campus map to view the map.")
             return GameState.CONTINUE
 
-        print("\nGenerating campus map...")
-
-        dir_delta = {
-            'north': (0, -1),
-            'south': (0, 1),
-            'east': (1, 0),
-            'west': (-1, 0)
-        }
+        radius = MAP_VIEW_RADIUS
+        if args:
+            if args[0] == 'full':
+                radius = None
+            elif args[0] == 'zoom':
+                radius = 1
+            elif args[0].isdecimal():
+                # Very long digit strings are not even converted
+                digits = args[0].lstrip('0') or '0'
+                radius = int(digits) if len(digits) <= 4 else MAP_MAX_RADIUS
+                if radius > MAP_MAX_RADIUS:
+                    print(f"The map shows at most {MAP_MAX_RADIUS} locations around you; use 'map full' for the whole campus.")
+                    radius = MAP_MAX_RADIUS
+            else:
+                print("Usage: map [radius|zoom|full]")
+                return GameState.CONTINUE
 
-        from collections import deque, defaultdict
-        coords = {}
-        start_location_for_map = 'University Entrance'
-        if start_location_for_map not in map_data:
+        layout = self.world.map_layout()
+        if layout is None:
             print("Error: Start point 'University Entrance' not found in map data.")
             return GameState.CONTINUE
 
-        queue_bfs = deque([start_location_for_map])
-        processed_for_bfs = {start_location_for_map}
-        coords[start_location_for_map] = (0, 0)
-
-        while queue_bfs:
-            current_loc_name = queue_bfs.popleft()
-            current_x, current_y = coords[current_loc_name]
-            if current_loc_name not in map_data:
-                continue
-            for direction, destination_loc_name in map_data[current_loc_name].get('EXITS', {}).items():
-                if direction in dir_delta:
-                    dx, dy = dir_delta[direction]
-                    next_x, next_y = current_x + dx, current_y + dy
-                    if destination_loc_name not in processed_for_bfs:
-                        if destination_loc_name not in coords:
-                            coords[destination_loc_name] = (next_x, next_y)
-                        processed_for_bfs.add(destination_loc_name)
-                        queue_bfs.append(destination_loc_name)
-                    elif destination_loc_name not in coords:
-                        coords[destination_loc_name] = (next_x, next_y)
+        print("\nGenerating campus map...")
+
+        cells = layout['cells']
+        if cells:
+            if radius is None:
+                min_x, max_x, min_y, max_y = layout['bounds']
+            elif self.state.player_location in layout['coords']:
+                # The window never extends past the edges of the campus
+                player_x, player_y = layout['coords'][self.state.player_location]
+                bound_min_x, bound_max_x, bound_min_y, bound_max_y = layout['bounds']
+                min_x, max_x = max(player_x - radius, bound_min_x), min(player_x + radius, bound_max_x)
+                min_y, max_y = max(player_y - radius, bound_min_y), min(player_y + radius, bound_max_y)
+            else:
+                min_x = max_x = min_y = max_y = None
 
-        # Add all unconnected locations to a special row
-        all_locations = set(map_data.keys())
-        connected_locations = set(coords.keys())
-        unconnected_locations = all_locations - connected_locations
-
-        rev_coords = defaultdict(list)
-        for loc_name, (x, y) in coords.items():
-            rev_coords[(x, y)].append(loc_name)
-
-        if rev_coords:
-            all_x_coords = [x for x, y in rev_coords.keys()]
-            all_y_coords = [y for x, y in rev_coords.keys()]
-            min_x, max_x = min(all_x_coords), max(all_x_coords)
-            min_y, max_y = min(all_y_coords), max(all_y_coords)
-            grid_height = max_y - min_y + 1
-            grid_width = max_x - min_x + 1
-            cell_width = 20
-            empty_cell_placeholder = " " * cell_width
-            grid_display = [[empty_cell_placeholder for _ in range(grid_width)] for _ in range(grid_height)]
-            for (x, y), loc_name_list in rev_coords.items():
-                grid_y_idx = y - min_y
-                grid_x_idx = x - min_x
-                raw_label = "/".join(loc_name_list)
-                player_marker = ""
-                if self.state.player_location in loc_name_list:
-                    player_marker = " (*)"
-                available_label_width = cell_width - 2 - len(player_marker)
-                if len(raw_label) > available_label_width:
-                    display_label = raw_label[:available_label_width-3] + "..."
-                else:
-                    display_label = raw_label
-                formatted_label = f"[{display_label.ljust(available_label_width)}{player_marker}]"
-                grid_display[grid_y_idx][grid_x_idx] = formatted_label
-            print("\nCampus Map (N↑ S↓ E→ W←):")
-            print("(*) indicates your current location")
-            for row in grid_display:
-                print("".join(row))
+            if min_x is not None:
+                # Only the cells inside the window are looked up in the spatial hash
+                empty_cell_placeholder = " " * MAP_CELL_WIDTH
+                print("\nCampus Map (N↑ S↓ E→ W←):")
+                print("(*) indicates your current location")
+                for y in range(min_y, max_y + 1):
+                    row = []
+                    for x in range(min_x, max_x + 1):
+                        loc_name_list = cells.get((x, y))
+                        if loc_name_list:
+                            row.append(format_map_cell(loc_name_list, self.state.player_location))
+                        else:
+                            row.append(empty_cell_placeholder)
+                    print("".join(row))
+            else:
+                print("\nYour current location is not on the connected map.")
         else:
             print("No connected locations to display.")
 
         # Show unconnected locations in a separate row
-        if unconnected_locations:
+        if layout['unconnected']:
             print("\nUnconnected locations (not reachable from the main map):")
-            cell_width = 20
             row = ""
-            for loc in sorted(unconnected_locations):
+            for loc in layout['unconnected']:
                 marker = " (*)" if self.state.player_location == loc else ""
-                available_label_width = cell_width - 2 - len(marker)
+                available_label_width = MAP_CELL_WIDTH - 2 - len(marker)
                 label = loc[:available_label_width]
                 formatted_label = f"[{label.ljust(available_label_width)}{marker}]"
                 row += formatted_label
             print(row)
         return GameState.CONTINUE
 
-def display_location(location_name):
-    """Display current location information"""
-    current_place = map_data[location_name]
-    
-    print("\n" + "=" * 50)
-    print(current_place['DESCRIPTION'])
-    print("=" * 50)
-    
+    # Verb -> handler, shared by every session rather than bound per instance
+    commands = {
+        'go': go,
+        'look': look,
+        'take': take,
+        'inventory': inventory,
+        'quit': quit,
+        'help': help,
+        'save': save,
+        'load': load,
+        'hint': hint,
+        'use': use,
+        'examine': examine,
+        'score': score,
+        'achievements': achievements,
+        'stats': stats,
+        'time': time,
+        'difficulty': difficulty,
+        'map': show_map,
+        'leaderboard': leaderboard,
+        'undo': undo,
+        'rewind': rewind
+    }
+
+def deep_size(obj, seen):
+    """Bytes held by obj and everything it references whose id is not in seen
+
+    Every object counted is added to seen. Classes, functions, listeners and
+    enum members are shared by all sessions and never counted.
+    """
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, Enum) or callable(current):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        else:
+            for cls in type(current).__mro__:
+                for slot in cls.__dict__.get('__slots__', ()):
+                    if hasattr(current, slot):
+                        stack.append(getattr(current, slot))
+            if hasattr(current, '__dict__'):
+                stack.append(current.__dict__)
+    return total
+
+def session_memory(commands, shared=None):
+    """Break down the memory held by one session, per subsystem
+
+    shared holds ids of objects used by many sessions, such as the base
+    world a session's world was forked from; they are not counted.
+    """
+    if shared is None:
+        shared = set()
+        base = commands.world._base
+        if base is not None:
+            deep_size(base.locations, shared)
+    seen = set(shared)
+    state = commands.state
+    return {
+        'hint system': deep_size(state.hint_system, seen),
+        'game state': deep_size(state, seen),
+        'world changes': deep_size(commands.world, seen),
+        'undo history': deep_size(commands.history, seen)
+    }
+
+def new_session_memory(world=None, difficulty='normal'):
+    """Measure with tracemalloc what each subsystem of a new session allocates"""
+    world = world or default_world
+    base = world._base or world
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        kept = []
+        breakdown = {}
+        steps = [
+            ('hint system', HintSystem),
+            ('world fork', base.fork),
+            ('game state', lambda: create_game_state(difficulty, kept[1].locations)),
+            ('command handler and undo history', lambda: GameCommands(kept[2], kept[1]))
+        ]
+        for subsystem, build in steps:
+            before = tracemalloc.get_traced_memory()[0]
+            kept.append(build())
+            breakdown[subsystem] = tracemalloc.get_traced_memory()[0] - before
+        # The game state includes a hint system of its own
+        breakdown['game state'] -= breakdown['hint system']
+        return breakdown
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+# Campus map display settings
+MAP_CELL_WIDTH = 20
+MAP_VIEW_RADIUS = 2
+MAP_MAX_RADIUS = MAP_VIEW_RADIUS * 4  # Largest 'map N' window, so a view's cost stays bounded
+
+def build_map_layout(locations):
+    """Place locations on a grid by BFS over N/S/E/W exits and index them by cell"""
+    from collections import deque, defaultdict
+    dir_delta = {
+        'north': (0, -1),
+        'south': (0, 1),
+        'east': (1, 0),
+        'west': (-1, 0)
+    }
+
+    coords = {}
+    start_location_for_map = 'University Entrance'
+    if start_location_for_map not in locations:
+        return None
+
+    queue_bfs = deque([start_location_for_map])
+    processed_for_bfs = {start_location_for_map}
+    coords[start_location_for_map] = (0, 0)
+
+    while queue_bfs:
+        current_loc_name = queue_bfs.popleft()
+        current_x, current_y = coords[current_loc_name]
+        if current_loc_name not in locations:
+            continue
+        for direction, destination_loc_name in locations[current_loc_name].get('EXITS', {}).items():
+            if direction in dir_delta:
+                dx, dy = dir_delta[direction]
+                next_x, next_y = current_x + dx, current_y + dy
+                if destination_loc_name not in processed_for_bfs:
+                    if destination_loc_name not in coords:
+                        coords[destination_loc_name] = (next_x, next_y)
+                    processed_for_bfs.add(destination_loc_name)
+                    queue_bfs.append(destination_loc_name)
+                elif destination_loc_name not in coords:
+                    coords[destination_loc_name] = (next_x, next_y)
+
+    # Spatial hash: grid cell -> locations placed there
+    cells = defaultdict(list)
+    for loc_name, (x, y) in coords.items():
+        cells[(x, y)].append(loc_name)
+
+    bounds = None
+    if cells:
+        all_x_coords = [x for x, y in cells.keys()]
+        all_y_coords = [y for x, y in cells.keys()]
+        bounds = (min(all_x_coords), max(all_x_coords), min(all_y_coords), max(all_y_coords))
+
+    return {
+        'coords': coords,
+        'cells': dict(cells),
+        'bounds': bounds,
+        'unconnected': sorted(set(locations.keys()) - set(coords.keys()))
+    }
+
+def format_map_cell(loc_name_list, player_location):
+    """Format the label of one map cell, marking the player's location"""
+    raw_label = "/".join(loc_name_list)
+    player_marker = ""
+    if player_location in loc_name_list:
+        player_marker = " (*)"
+    available_label_width = MAP_CELL_WIDTH - 2 - len(player_marker)
+    if len(raw_label) > available_label_width:
+        display_label = raw_label[:available_label_width-3] + "..."
+    else:
+        display_label = raw_label
+    return f"[{display_label.ljust(available_label_width)}{player_marker}]"
+
+def render_location_view(current_place, location_name=None):
+    """Build the full text shown when entering or looking at a location"""
+    banner = "=" * 50
     if current_place['ITEMS']:
-        print("\nYou see: " + ", ".join(current_place['ITEMS']))
+        items_line = "You see: " + ", ".join(current_place['ITEMS'])
     else:
-        print("\nThere are no items of interest here.")
-    
-    exits = current_place['EXITS']
-    available_directions = list(exits.keys())
-    print("\nYou can go: " + ", ".join(available_directions))
+        items_line = "There are no items of interest here."
+    exits_line = "You can go: " + ", ".join(current_place['EXITS'].keys())
+    # Worlds loaded from files may describe their own locations
+    description = current_place.get('DESCRIPTION')
+    if description is None:
+        description = text(f"location.{location_name}", "") if location_name else ""
+    return f"\n{banner}\n{description}\n{banner}\n\n{items_line}\n\n{exits_line}\n"
+
+def display_location(location_name, world=None):
+    """Display current location information"""
+    sys.stdout.write((world or default_world).render_location(location_name))
 
 def display_welcome_screen():
     """Display the game's welcome screen and difficulty selection"""
-    print("\n" + "=" * 50)
-    print("Welcome to Campus Treasure Hunt!")
-    print("A text-based adventure game at the University of Sydney")
-    print("=" * 50)
-    print("\nYour goal is to find the lost COMP9001 notes somewhere on campus.")
-    print("\nAvailable difficulty levels:")
+    print(text("welcome"))
     for level, details in DIFFICULTY_LEVELS.items():
         time_limit = "No limit" if details['time_limit'] == 0 else f"{details['time_limit']//60} minutes"
         print(f"\n{level.capitalize()}:")
@@ -924,10 +1537,7 @@ def display_welcome_screen():
         if choice in DIFFICULTY_LEVELS:
             return choice
         elif choice == 'help':
-            print("\nDifficulty levels explained:")
-            print("Easy: Perfect for beginners - no time pressure, plenty of hints")
-            print("Normal: Balanced challenge - moderate time limit, limited hints")
-            print("Hard: For experienced players - strict time limit, very few hints")
+            print(text("welcome.difficulty_help"))
         else:
             print("Invalid choice. Please select 'easy', 'normal', or 'hard'.")
 
@@ -935,16 +1545,21 @@ def initialize_game():
     """Initialize game state"""
     # Display welcome screen and get difficulty choice
     difficulty = display_welcome_screen()
-    
-    # Initialize game state
+    return create_game_state(difficulty)
+
+def create_game_state(difficulty, locations=None):
+    """Create a fresh game state for the given difficulty"""
+    if locations is None:
+        locations = map_data
+
     state = GameStateManager()
     state.difficulty = difficulty
-    state.start_time = time.time()
+    state.start_time = clock()
     state.time_limit = DIFFICULTY_LEVELS[difficulty]['time_limit']
     state.remaining_hints = DIFFICULTY_LEVELS[difficulty]['hints']
     
     # Collect required items
-    for location in map_data.values():
+    for location in locations.values():
         if 'SPECIAL' in location:
             for item, details in location['SPECIAL'].items():
                 if details['required']:
@@ -952,11 +1567,38 @@ def initialize_game():
     
     return state
 
-def game_loop():
-    """Main game loop"""
-    state = initialize_game()
+def game_loop(difficulty=None, script=None, player=None):
+    """Main game loop
+
+    Without a difficulty the player picks one on the welcome screen. A
+    script of command lines replaces the keyboard, and a won game is then
+    only recorded on the leaderboard if a player name is given.
+    """
+    state = create_game_state(difficulty) if difficulty else initialize_game()
+    event_log = EventLog(EVENT_LOG_FILE) if EVENT_LOG_FILE else None
+    if event_log:
+        state.event_listeners.append(event_log)
     commands = GameCommands(state)
     
+    try:
+        game_status = play(commands, script)
+    finally:
+        if event_log:
+            event_log.close()
+
+    if game_status == GameState.WIN and (script is None or player):
+        record_on_leaderboard(commands.state, player)
+
+def play(commands, script=None):
+    """Run the command loop of a new game and return how it ended
+
+    Commands are read from script, an iterable of lines, when one is
+    given; no prompts are shown and the game is quit when it runs out.
+    """
+    lines = iter(script) if script is not None else None
+    state = commands.state
+    state.emit('start', location=state.player_location)
+
     print("\n" + "=" * 50)
     print(f"Starting game in {state.difficulty} mode")
     if state.time_limit > 0:
@@ -970,69 +1612,216 @@ def game_loop():
     if not state.has_entered_campus:
         print("\nYou are at the university entrance. You need to show your student card to enter.")
     
-    display_location(state.player_location)
+    display_location(state.player_location, commands.world)
     
     game_status = GameState.CONTINUE
     while game_status == GameState.CONTINUE:
-        if state.time_limit > 0:
-            elapsed_time = time.time() - state.start_time
-            if elapsed_time > state.time_limit:
-                print("\nTime's up! Game over.")
-                return
+        if state.time_is_up():
+            print("\nTime's up! Game over.")
+            game_status = GameState.LOSE
+            break
         
-        command = input("\n> ")
+        if lines is None:
+            command = input("\n> ")
+        else:
+            command = next(lines, None)
+            if command is None:
+                game_status = GameState.QUIT
+                break
         game_status = commands.process(command)
-        
-        # Check achievements after each command
-        state.check_achievements()
+        state = commands.state  # 'load' replaces the state
         
         # Handle special events
-        if game_status == GameState.SPECIAL_EVENT:
-            game_status = GameState.CONTINUE
-        elif game_status == GameState.ACCESS_DENIED:
+        if game_status in (GameState.SPECIAL_EVENT, GameState.ACCESS_DENIED, GameState.HINT_ACTIVATED):
             game_status = GameState.CONTINUE
+
+    state.emit_end(game_status)
+    if game_status == GameState.LOSE:
+        return game_status
     
-    print(f"\nGame over. Final score: {state.game_score}")
+    print(f"\nGame over. Final score: {state.final_score()}")
     if state.achievements:
         print("\nAchievements earned:")
         for achievement in state.achievements:
             print(f"  - {achievement.value}")
+    return game_status
+
+def record_on_leaderboard(state, player=None):
+    """Add a completed game to the leaderboard, asking for the player's name if not given"""
+    if not player:
+        player = input("\nEnter your name for the leaderboard: ").strip() or "Anonymous"
+    try:
+        board = Leaderboard(LEADERBOARD_FILE)
+        try:
+            rank = board.record(player, state)
+            total = board.size(state.difficulty)
+        finally:
+            board.close()
+        print(f"You ranked {rank} of {total} on the {state.difficulty} leaderboard.")
+    except sqlite3.Error as e:
+        print(f"Error saving to leaderboard: {e}")
+
+def ensure_all_locations_connected(locations=None):
+    """Ensure all locations in map_data are connected from 'University Entrance', using only N/S/E/W directions.
 
-def ensure_all_locations_connected():
-    """Ensure all locations in map_data are connected from 'University Entrance', using only N/S/E/W directions."""
+    Returns the names of the locations whose exits were changed.
+    """
+    if locations is None:
+        locations = map_data
     from collections import deque
     directions = ['north', 'south', 'east', 'west']
     reverse_dir = {'north': 'south', 'south': 'north', 'east': 'west', 'west': 'east'}
     # Step 1: Find all reachable locations
     reachable = set()
+    changed = set()
     queue = deque(['University Entrance'])
     while queue:
         loc = queue.popleft()
         if loc in reachable:
             continue
         reachable.add(loc)
-        for dest in map_data[loc]['EXITS'].values():
+        for dest in locations[loc]['EXITS'].values():
             if dest not in reachable:
                 queue.append(dest)
     # Step 2: Find all locations in map_data
-    all_locations = set(map_data.keys())
+    all_locations = set(locations.keys())
     unreachable = all_locations - reachable
     # Step 3: For each unreachable location, connect it to a connected node with a free N/S/E/W direction
     for unloc in unreachable:
         for node in list(reachable):
-            used_dirs = set(map_data[node]['EXITS'].keys())
+            used_dirs = set(locations[node]['EXITS'].keys())
             available_dirs = [d for d in directions if d not in used_dirs]
             if available_dirs:
                 dir = available_dirs[0]
-                map_data[node]['EXITS'][dir] = unloc
-                if 'EXITS' not in map_data[unloc]:
-                    map_data[unloc]['EXITS'] = {}
-                map_data[unloc]['EXITS'][reverse_dir[dir]] = node
+                locations[node]['EXITS'][dir] = unloc
+                if 'EXITS' not in locations[unloc]:
+                    locations[unloc]['EXITS'] = {}
+                locations[unloc]['EXITS'][reverse_dir[dir]] = node
+                changed.update((node, unloc))
                 reachable.add(unloc)
                 break
+    return changed
+
+def generate_campus(width, height):
+    """Generate a width x height grid campus for scale and load testing"""
+    dir_delta = {
+        'north': (0, -1),
+        'south': (0, 1),
+        'east': (1, 0),
+        'west': (-1, 0)
+    }
+
+    def block_name(x, y):
+        return 'University Entrance' if (x, y) == (0, 0) else f"Block {x}-{y}"
+
+    locations = {}
+    for y in range(height):
+        for x in range(width):
+            exits = {}
+            for direction, (dx, dy) in dir_delta.items():
+                if 0 <= x + dx < width and 0 <= y + dy < height:
+                    exits[direction] = block_name(x + dx, y + dy)
+            locations[block_name(x, y)] = {
+                'DESCRIPTION': f"You are in campus block {x}-{y}.",
+                'EXITS': exits,
+                'ITEMS': [f"pamphlet_{x}_{y}"] if (x + y) % 3 == 0 else [],
+                'SPECIAL': {}
+            }
+
+    entrance = locations['University Entrance']
+    entrance['ITEMS'] = ['student_card', 'campus_map']
+    entrance['SPECIAL'] = {
+        'student_card': {
+            'required': True,
+            'type': ItemType.ACCESS
+        }
+    }
+    far_corner = locations[block_name(width - 1, height - 1)]
+    far_corner['ITEMS'].append('COMP9001 notes')
+    far_corner['SPECIAL']['COMP9001 notes'] = {'required': True}
+    return locations
+
+def save_world(path, locations=None):
+    """Write campus locations to a JSON file that load_world can read back"""
+    if locations is None:
+        locations = map_data
+    with open(path, 'w') as f:
+        json.dump(locations, f, indent=2, default=lambda item_type: item_type.value)
+
+def check_world_structure(locations):
+    """Raise ValueError unless locations have the fields and types the game reads"""
+    if not isinstance(locations, dict):
+        raise ValueError("World must be a JSON object mapping location names to locations")
+    for location_name, location in locations.items():
+        if not isinstance(location, dict):
+            raise ValueError(f"Location '{location_name}' must be an object")
+        exits = location.get('EXITS')
+        if not isinstance(exits, dict) or not all(isinstance(d, str) for d in exits.values()):
+            raise ValueError(f"'{location_name}' needs EXITS mapping directions to location names")
+        items = location.get('ITEMS')
+        if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+            raise ValueError(f"'{location_name}' needs ITEMS as a list of item names")
+        if not isinstance(location.get('DESCRIPTION', ""), str):
+            raise ValueError(f"The DESCRIPTION of '{location_name}' must be text")
+        special = location.get('SPECIAL', {})
+        if not isinstance(special, dict) or not all(isinstance(d, dict) and 'required' in d
+                                                    for d in special.values()):
+            raise ValueError(f"'{location_name}' SPECIAL items must be objects with a 'required' flag")
+        access = location.get('ACCESS_CONTROL', {})
+        if not isinstance(access, dict) or (access and (not isinstance(access.get('required_items'), list)
+                                                        or not isinstance(access.get('denied_message'), str))):
+            raise ValueError(f"'{location_name}' ACCESS_CONTROL needs required_items and a denied_message")
+
+def load_world(path):
+    """Load campus locations from a JSON file, checking their structure and that every exit leads somewhere"""
+    with open(path, 'r') as f:
+        locations = json.load(f)
+    check_world_structure(locations)
+    if 'University Entrance' not in locations:
+        raise ValueError("World has no 'University Entrance'")
+    for location_name, location in locations.items():
+        for destination in location['EXITS'].values():
+            if destination not in locations:
+                raise ValueError(f"Exit from '{location_name}' leads to unknown location '{destination}'")
+        for details in location.get('SPECIAL', {}).values():
+            if 'type' in details:
+                details['type'] = ItemType(details['type'])
+    ensure_all_locations_connected(locations)
+    return locations
 
 # Call this function at the start of the game
 ensure_all_locations_connected()
 
+# The campus used by sessions that are not given a world of their own
+default_world = World(map_data)
+
+def run_script(path, difficulty, player=None):
+    """Play a game from a file of commands, or standard input for '-', without prompts"""
+    # Output is block-buffered even on a terminal and flushed when the script ends
+    sys.stdout.flush()
+    sys.stdout = open(sys.stdout.fileno(), 'w', buffering=SCRIPT_OUTPUT_BUFFER,
+                      encoding=sys.stdout.encoding, closefd=False)
+    source = sys.stdin if path == '-' else open(path, 'r')
+    try:
+        game_loop(difficulty, (line.rstrip('\r\n') for line in source), player)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        sys.stdout.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description="Play Campus Treasure Hunt")
+    parser.add_argument('--difficulty', choices=list(DIFFICULTY_LEVELS),
+                        help="difficulty to play at instead of choosing on the welcome screen")
+    parser.add_argument('--script', metavar='FILE',
+                        help="run commands from FILE, or '-' for standard input, without prompts")
+    parser.add_argument('--name', help="name to record on the leaderboard after a win")
+    args = parser.parse_args()
+
+    if args.script is None:
+        game_loop(args.difficulty, player=args.name)
+    else:
+        run_script(args.script, args.difficulty or 'normal', args.name)
+
 if __name__ == "__main__":
-    game_loop() 
\ No newline at end of file
+    main()
@@ -0,0 +1,218 @@
+# Campus Treasure Hunt - load and soak testing
+# Runs many simulated players against real game processes through pseudo-terminals
+
+import argparse
+import os
+import random
+import re
+import select
+import subprocess
+import sys
+import tempfile
+import termios
+import threading
+import time
+from collections import Counter
+
+from analytics import distribution
+
+GAME_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'game.py')
+PROMPT = b'> '
+RESPONSE_TIMEOUT = 30
+DEFAULT_MIX = 'go=40,look=15,take=15,map=10,save=5,load=5,hint=5,inventory=5'
+# Gets the student card and campus map so every command in the mix can succeed
+PREAMBLE = ['take student_card', 'use student_card', 'go east', 'take campus_map', 'go west']
+
+class LoadStats:
+    """Command counts, latency histogram and memory samples shared by all clients"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.commands = Counter()
+        self.latencies = Counter()  # tenths of a millisecond -> count
+        self.errors = 0
+        self.memory = {}  # client -> [(elapsed seconds, RSS in KB), ...]
+
+    def record(self, verb, seconds):
+        with self.lock:
+            self.commands[verb] += 1
+            self.latencies[int(seconds * 10000)] += 1
+
+    def take_latencies(self):
+        """Return the latencies recorded since the last call and start a new interval"""
+        with self.lock:
+            latencies, self.latencies = self.latencies, Counter()
+            return latencies
+
+def resident_kb(pid):
+    """Return a process's resident set size in KB, or None once it has exited"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+class GameClient:
+    """One simulated player driving a game.py process through a pseudo-terminal"""
+    def __init__(self, client_id, stats, mix, rng):
+        self.client_id = client_id
+        self.stats = stats
+        self.mix = mix
+        self.rng = rng
+        self.directory = tempfile.TemporaryDirectory(prefix='campus-load-')
+        self.master, slave = os.openpty()
+        attributes = termios.tcgetattr(slave)
+        attributes[3] &= ~termios.ECHO  # Only read what the game prints
+        termios.tcsetattr(slave, termios.TCSANOW, attributes)
+        self.process = subprocess.Popen(
+            [sys.executable, GAME_SCRIPT], stdin=slave, stdout=slave, stderr=slave,
+            cwd=self.directory.name, start_new_session=True
+        )
+        os.close(slave)
+        self.last_output = ""
+
+    def read_until_prompt(self):
+        """Collect output until the game asks for the next command"""
+        chunks = []
+        deadline = time.monotonic() + RESPONSE_TIMEOUT
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self.master], [], [], remaining)[0]:
+                raise TimeoutError(f"client {self.client_id} got no prompt")
+            try:
+                chunk = os.read(self.master, 65536)
+            except OSError:
+                chunk = b''
+            if not chunk:
+                raise EOFError(f"client {self.client_id}'s game exited")
+            chunks.append(chunk)
+            if chunk.endswith(PROMPT):
+                self.last_output = b''.join(chunks).decode(errors='replace').replace('\r\n', '\n')
+                return self.last_output
+
+    def send(self, command):
+        os.write(self.master, command.encode() + b'\n')
+        return self.read_until_prompt()
+
+    def timed(self, command):
+        started = time.perf_counter()
+        self.send(command)
+        self.stats.record(command.split()[0], time.perf_counter() - started)
+
+    def choose_command(self):
+        verb = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        if verb == 'go':
+            exits = re.findall(r'You can go: (.*)', self.last_output)
+            directions = exits[-1].split(', ') if exits else ['north', 'south', 'east', 'west']
+            return 'go ' + self.rng.choice(directions)
+        if verb == 'take':
+            seen = re.findall(r'You see: (.*)', self.last_output)
+            # Picking up the notes would win and end the soak
+            items = [item for item in (seen[-1].split(', ') if seen else []) if item != 'COMP9001 notes']
+            return 'take ' + (self.rng.choice(items) if items else 'student_card')
+        return verb
+
+    def sample_memory(self, started):
+        rss = resident_kb(self.process.pid)
+        if rss is not None:
+            with self.stats.lock:
+                self.stats.memory.setdefault(self.client_id, []).append((time.monotonic() - started, rss))
+
+    def run(self, deadline, started, sample_every):
+        try:
+            self.read_until_prompt()
+            self.send('easy')
+            self.sample_memory(started)
+            for command in PREAMBLE:
+                self.timed(command)
+            issued = 0
+            while time.monotonic() < deadline:
+                self.timed(self.choose_command())
+                issued += 1
+                if issued % sample_every == 0:
+                    self.sample_memory(started)
+            self.sample_memory(started)
+            os.write(self.master, b'quit\n')
+            self.process.wait(RESPONSE_TIMEOUT)
+        except (TimeoutError, EOFError, OSError, subprocess.TimeoutExpired) as e:
+            with self.stats.lock:
+                self.stats.errors += 1
+            print(f"Client {self.client_id} failed: {e}", file=sys.stderr)
+        finally:
+            if self.process.poll() is None:
+                self.process.kill()
+                self.process.wait()
+            os.close(self.master)
+            self.directory.cleanup()
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        verb, _, weight = part.partition('=')
+        mix[verb.strip()] = float(weight or 1)
+    return mix
+
+def summarize_latency(latencies):
+    summary = distribution(latencies)
+    return (f"p50 {summary['p50'] / 10:.1f}ms, p90 {summary['p90'] / 10:.1f}ms, "
+            f"p99 {summary['p99'] / 10:.1f}ms, max {summary['max'] / 10:.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load and soak test the interactive game through pseudo-terminals")
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=60, help="seconds to run")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="command weights, e.g. go=40,take=15")
+    parser.add_argument('--report-every', type=float, default=10, help="seconds between interim reports")
+    parser.add_argument('--sample-every', type=int, default=50, help="commands between memory samples")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    stats = LoadStats()
+    mix = parse_mix(args.mix)
+    started = time.monotonic()
+    deadline = started + args.duration
+    clients = [GameClient(i, stats, mix, random.Random(args.seed + i)) for i in range(args.clients)]
+    threads = [threading.Thread(target=client.run, args=(deadline, started, args.sample_every), daemon=True)
+               for client in clients]
+    for thread in threads:
+        thread.start()
+
+    all_latencies = Counter()
+    last_report = started
+    last_total = 0
+    while any(thread.is_alive() for thread in threads):
+        for thread in threads:
+            thread.join(timeout=max(0.0, last_report + args.report_every - time.monotonic()))
+            if time.monotonic() >= last_report + args.report_every:
+                break
+        now = time.monotonic()
+        interval = stats.take_latencies()
+        all_latencies.update(interval)
+        total = sum(stats.commands.values())
+        if interval:
+            print(f"[{now - started:6.0f}s] {(total - last_total) / (now - last_report):8.1f} commands/s, "
+                  + summarize_latency(interval))
+        last_report, last_total = now, total
+    all_latencies.update(stats.take_latencies())
+
+    elapsed = time.monotonic() - started
+    total = sum(stats.commands.values())
+    print(f"\nClients: {args.clients}, duration {elapsed:.0f}s, errors {stats.errors}")
+    print(f"Commands: {total} ({total / elapsed:.1f} commands/s)")
+    print("  " + ", ".join(f"{verb} {count}" for verb, count in stats.commands.most_common()))
+    if all_latencies:
+        print("Latency: " + summarize_latency(all_latencies))
+
+    samples = [points for points in stats.memory.values() if len(points) >= 2]
+    if samples:
+        first = sum(points[0][1] for points in samples) / len(samples)
+        last = sum(points[-1][1] for points in samples) / len(samples)
+        hours = sum(points[-1][0] - points[0][0] for points in samples) / len(samples) / 3600
+        rate = f", {(last - first) / hours:.0f} KB/hour" if hours else ""
+        print(f"Memory per game process: {first:.0f} KB -> {last:.0f} KB "
+              f"({last - first:+.0f} KB{rate})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+# Campus Treasure Hunt - JSON command API
+# Serves batches of game commands over local HTTP/1.1 with keep-alive
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import traceback
+from collections import Counter
+
+from game import deep_size, load_world, new_session_memory, save_world, session_memory
+from sessions import (FINISHED, IDLE_SECONDS, MAX_RESIDENT_SESSIONS, SESSION_DIR, SessionManager,
+                      UnknownSession)
+from spectators import Broadcaster, stream
+
+HOST = "127.0.0.1"
+PORT = 8009
+MAX_BODY_BYTES = 1024 * 1024
+MEMORY_SAMPLE_SESSIONS = 200  # Resident sessions measured per /admin/memory request
+WORLD_CHECK_SECONDS = 5
+
+class HTTPError(Exception):
+    """An error reported to the client with an HTTP status"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+class GameServer:
+    """Routes HTTP requests to player sessions
+
+    POST /sessions                 start a game: {"difficulty": "easy"}
+    POST /sessions/<id>/commands   run a batch: {"commands": ["take student_card", ...]}
+    GET  /sessions/<id>            the session's current state
+    GET  /sessions/<id>/events     watch a session's events live (Server-Sent Events)
+    GET  /events                   watch every session's events live
+    GET  /world                    the published world versions
+    POST /world/reload             publish the world file's current content
+    GET  /admin/memory             memory of resident sessions per subsystem, from a sample
+    GET  /admin/spectators         watchers per session and events fanned out
+
+    A batch stops early once a command ends the game, and the session is
+    then forgotten.
+    """
+    def __init__(self, manager, world_file=None):
+        self.manager = manager
+        self.spectators = Broadcaster()
+        manager.session_listeners.append(self.spectators.publish)
+        self.world_file = world_file
+        self.world_mtime = os.path.getmtime(world_file) if world_file else None
+
+    async def reload_world(self):
+        """Load the world file off the event loop, then publish it as the latest version"""
+        if not self.world_file:
+            raise HTTPError(404, "The server was not started with a world file")
+        self.world_mtime = os.path.getmtime(self.world_file)  # A broken file is reported once
+        try:
+            locations = await asyncio.to_thread(load_world, self.world_file)
+        except (OSError, ValueError, KeyError) as e:
+            raise HTTPError(400, f"Could not load {self.world_file}: {e}")
+        version = self.manager.reload(locations)
+        print(f"Published world version {version} from {self.world_file}")
+        return 200, self.world_status()
+
+    def world_status(self):
+        worlds = self.manager.worlds
+        return {'latest': worlds.latest,
+                'versions': {version: worlds.references[version] for version in worlds.worlds}}
+
+    def memory_status(self):
+        """Estimate the memory of resident sessions, not counting shared worlds
+
+        Sessions are measured on the event loop, so only a random sample of
+        them is walked to keep the pause short however many are resident.
+        """
+        shared = set()
+        for world in self.manager.worlds.worlds.values():
+            deep_size(world.locations, shared)
+        resident = len(self.manager.resident)
+        sample = random.sample(list(self.manager.resident.values()), min(resident, MEMORY_SAMPLE_SESSIONS))
+        totals = Counter()
+        for session in sample:
+            totals.update(session_memory(session.commands, shared))
+        average = {subsystem: size / len(sample) for subsystem, size in totals.items()} if sample else {}
+        return {'resident_sessions': resident, 'sampled_sessions': len(sample), 'average_bytes': average,
+                'estimated_total_bytes': {subsystem: round(size * resident) for subsystem, size in average.items()},
+                'new_session_bytes': new_session_memory(self.manager.worlds.worlds[self.manager.worlds.latest])}
+
+    def route(self, method, path, body):
+        parts = [part for part in path.split('/') if part]
+        if parts == ['admin', 'memory']:
+            if method != 'GET':
+                raise HTTPError(405, "Use GET to read memory usage")
+            return 200, self.memory_status()
+        if parts == ['admin', 'spectators']:
+            if method != 'GET':
+                raise HTTPError(405, "Use GET to read the spectator feed status")
+            return 200, self.spectators.status()
+        if parts == ['world']:
+            if method != 'GET':
+                raise HTTPError(405, "Use GET to read the world versions")
+            return 200, self.world_status()
+        if not parts or parts[0] != 'sessions' or len(parts) > 3:
+            raise HTTPError(404, f"Unknown path: {path}")
+
+        if len(parts) == 1:
+            if method != 'POST':
+                raise HTTPError(405, "Use POST to start a session")
+            return 201, self.start_session(body)
+
+        session_id = parts[1]
+        if not self.manager.exists(session_id):
+            raise HTTPError(404, f"Unknown session: {session_id}")
+        if len(parts) == 2:
+            if method != 'GET':
+                raise HTTPError(405, "Use GET to read a session")
+            return 200, {'session': session_id, 'state': self.manager.get(session_id).state.to_dict()}
+        if parts[2] != 'commands':
+            raise HTTPError(404, f"Unknown path: {path}")
+        if method != 'POST':
+            raise HTTPError(405, "Use POST to run commands")
+        return self.run_commands(session_id, body)
+
+    def start_session(self, body):
+        difficulty = body.get('difficulty', 'normal')
+        try:
+            session = self.manager.create(difficulty)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        view = session.commands.world.render_location(session.state.player_location)
+        return {'session': session.id, 'messages': view.strip().splitlines(),
+                'state': session.state.to_dict()}
+
+    def run_commands(self, session_id, body):
+        """Run a batch of commands; returns (HTTP status, payload)
+
+        A command that fails stops the batch with a 500, but the results of
+        the commands already applied and the session's state are still
+        returned.
+        """
+        commands = body.get('commands')
+        if not isinstance(commands, list) or not all(isinstance(c, str) for c in commands):
+            raise HTTPError(400, "'commands' must be a list of strings")
+
+        session = self.manager.get(session_id)
+        results = []
+        for command in commands:
+            score_before = session.state.game_score
+            try:
+                status, output = self.manager.execute(session_id, command)
+            except Exception:
+                traceback.print_exc()
+                results.append({'command': command, 'status': 'error', 'error': "Internal server error"})
+                return 500, {'session': session_id, 'results': results, 'state': session.state.to_dict(),
+                             'error': f"Command {len(results)} failed; the commands before it were applied"}
+            results.append({
+                'command': command,
+                'status': status.value,
+                'messages': output.strip().splitlines(),
+                'score_delta': session.state.game_score - score_before
+            })
+            if status in FINISHED:
+                break
+        return 200, {'session': session_id, 'results': results, 'state': session.state.to_dict()}
+
+    def watched_session(self, method, path):
+        """Return (True, session ID or None) if a request is for a spectator feed, else (False, None)"""
+        parts = [part for part in path.split('/') if part]
+        if method != 'GET':
+            return False, None
+        if parts == ['events']:
+            return True, None
+        if len(parts) == 3 and parts[0] == 'sessions' and parts[2] == 'events':
+            if not self.manager.exists(parts[1]):
+                raise HTTPError(404, f"Unknown session: {parts[1]}")
+            return True, parts[1]
+        return False, None
+
+    async def watch(self, writer, session_id):
+        """Stream live events to a spectator until the game ends or the spectator falls behind"""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        subscriber = self.spectators.subscribe(session_id)
+        try:
+            await stream(subscriber, writer)
+        finally:
+            self.spectators.unsubscribe(subscriber)
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one connection until the client closes it"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, path, version = lines[0].split(' ', 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                try:
+                    try:
+                        length = int(headers.get('content-length', 0))
+                    except ValueError:
+                        raise HTTPError(400, "Invalid Content-Length header")
+                    if length > MAX_BODY_BYTES:
+                        raise HTTPError(413, "Request body too large")
+                    raw_body = await reader.readexactly(length) if length else b''
+                    try:
+                        body = json.loads(raw_body) if raw_body else {}
+                    except ValueError:
+                        raise HTTPError(400, "Request body is not valid JSON")
+                    if not isinstance(body, dict):
+                        raise HTTPError(400, "Request body must be a JSON object")
+                    watching, session_id = self.watched_session(method, path)
+                    if watching:
+                        await self.watch(writer, session_id)
+                        break
+                    if path.rstrip('/') == '/world/reload':
+                        if method != 'POST':
+                            raise HTTPError(405, "Use POST to reload the world")
+                        status, payload = await self.reload_world()
+                    else:
+                        status, payload = self.route(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {'error': str(e)}
+                    keep_alive = keep_alive and e.status != 413
+                except UnknownSession as e:
+                    status, payload = 404, {'error': f"Unknown session: {e.args[0]}"}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    raise
+                except Exception:
+                    # A bug in the game must not leave the client without a response
+                    traceback.print_exc()
+                    status, payload = 500, {'error': "Internal server error"}
+                    keep_alive = False
+
+                response = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(response)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + response
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def hibernate_periodically(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            self.manager.hibernate_idle()
+
+    async def watch_world(self):
+        """Reload the world file whenever it changes on disk"""
+        while True:
+            await asyncio.sleep(WORLD_CHECK_SECONDS)
+            try:
+                changed = os.path.getmtime(self.world_file) != self.world_mtime
+            except OSError:
+                continue
+            if changed:
+                try:
+                    await self.reload_world()
+                except HTTPError as e:
+                    print(e)
+                except Exception:
+                    # Keep watching: the next change to the file may fix it
+                    traceback.print_exc()
+
+    async def serve(self, host=HOST, port=PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        tasks = [asyncio.create_task(self.hibernate_periodically(max(1, self.manager.idle_seconds / 10)))]
+        if self.world_file:
+            tasks.append(asyncio.create_task(self.watch_world()))
+        print(f"Serving Campus Treasure Hunt on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.manager.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Campus Treasure Hunt as a local JSON API")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--sessions', default=SESSION_DIR, help="directory for hibernated sessions")
+    parser.add_argument('--idle', type=float, default=IDLE_SECONDS, help="seconds before an idle session is hibernated")
+    parser.add_argument('--max-resident', type=int, default=MAX_RESIDENT_SESSIONS)
+    parser.add_argument('--world', help="JSON world file to serve and reload on change "
+                                        "(the built-in campus is written there if it does not exist)")
+    args = parser.parse_args()
+
+    locations = None
+    if args.world:
+        if not os.path.exists(args.world):
+            save_world(args.world)
+        locations = load_world(args.world)
+    manager = SessionManager(args.sessions, args.idle, args.max_resident, locations)
+    try:
+        asyncio.run(GameServer(manager, args.world).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+# Campus Treasure Hunt - server sessions
+# Keeps many players' games addressable by session ID, with idle ones hibernated to disk
+
+import contextlib
+import copy
+import functools
+import io
+import json
+import os
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from game import (DIFFICULTY_LEVELS, GameCommands, GameState, GameStateManager,
+                  World, create_game_state, map_data)
+
+SESSION_DIR = "sessions"
+IDLE_SECONDS = 300
+MAX_RESIDENT_SESSIONS = 10000
+FINISHED = (GameState.WIN, GameState.LOSE, GameState.QUIT)
+
+class UnknownSession(KeyError):
+    """No resident or hibernated session has the requested ID"""
+
+class WorldVersions:
+    """Published versions of the campus content
+
+    New sessions start on the latest version and stay on it for the rest
+    of their game, even after newer content is published. A version is
+    retired once it is no longer the latest and no session, resident or
+    hibernated, refers to it.
+    """
+    def __init__(self, locations):
+        self.worlds = {}
+        self.references = Counter()
+        self.latest = None
+        self.publish(locations)
+
+    def publish(self, locations):
+        """Make new content the latest version and return its ID"""
+        # IDs are unique across restarts, so stale pins from an earlier run are never matched
+        version = uuid.uuid4().hex[:12]
+        self.worlds[version] = World(locations)
+        self.latest = version
+        for old_version in list(self.worlds):
+            if old_version != version and not self.references[old_version]:
+                self._retire(old_version)
+        return version
+
+    def acquire(self, version=None):
+        """Pin a session to a version, the latest by default; returns (version, world)"""
+        if version not in self.worlds:
+            version = self.latest
+        self.references[version] += 1
+        return version, self.worlds[version]
+
+    def release(self, version):
+        """Unpin a finished session from its version"""
+        self.references[version] -= 1
+        if not self.references[version] and version != self.latest:
+            self._retire(version)
+
+    def _retire(self, version):
+        del self.worlds[version]
+        del self.references[version]
+
+class Session:
+    """One player's game: state, private world and command handler"""
+    def __init__(self, session_id, commands, world_version):
+        self.id = session_id
+        self.commands = commands
+        self.world_version = world_version
+        self.last_active = time.time()
+
+    @property
+    def state(self):
+        return self.commands.state
+
+    def execute(self, command_input):
+        """Run one command and return its status with everything it printed"""
+        self.last_active = time.time()
+        state = self.commands.state
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            if state.time_is_up():
+                print("\nTime's up! Game over.")
+                status = GameState.LOSE
+            else:
+                status = self.commands.process(command_input)
+        return status, output.getvalue()
+
+    def to_dict(self):
+        """Convert the session to a dictionary for hibernation"""
+        return {
+            'state': self.state.to_dict(),
+            'world_version': self.world_version,
+            'world': self.commands.world.changed_items()
+        }
+
+class SessionManager:
+    """Registry of player sessions with a bounded number kept in memory
+
+    Resident sessions are kept in least-recently-used order. Sessions idle
+    for longer than idle_seconds, and the oldest ones beyond max_resident,
+    are written to disk and dropped from memory. They are restored
+    transparently the next time they are used. Undo history does not
+    survive hibernation, and sessions hibernated before a restart resume
+    on the latest world version.
+    """
+    def __init__(self, directory=SESSION_DIR, idle_seconds=IDLE_SECONDS,
+                 max_resident=MAX_RESIDENT_SESSIONS, locations=None):
+        self.directory = directory
+        self.idle_seconds = idle_seconds
+        self.max_resident = max_resident
+        self.worlds = WorldVersions(copy.deepcopy(map_data) if locations is None else locations)
+        self.resident = OrderedDict()
+        self.event_listeners = []
+        self.session_listeners = []  # Called as listener(session_id, state, event, details)
+        self.hibernated = 0
+        self.restored = 0
+
+    def _path(self, session_id):
+        if not session_id.isalnum():
+            raise UnknownSession(session_id)  # IDs come from clients and must not escape the directory
+        # Spread session files over subdirectories to keep directories small
+        return os.path.join(self.directory, session_id[:2], session_id + '.json')
+
+    def _save_path(self, session_id):
+        """Where a session's own 'save' and 'load' commands keep its saved game"""
+        return os.path.join(self.directory, session_id[:2], session_id + '.save.json')
+
+    def _attach(self, session_id, state, world, world_version):
+        state.event_listeners.extend(self.event_listeners)
+        state.event_listeners.extend(functools.partial(listener, session_id) for listener in self.session_listeners)
+        commands = GameCommands(state, world, self._save_path(session_id))
+        session = Session(session_id, commands, world_version)
+        self.resident[session_id] = session
+        self._evict_overflow()
+        return session
+
+    def create(self, difficulty='normal'):
+        """Start a new game and return its session"""
+        if difficulty not in DIFFICULTY_LEVELS:
+            raise ValueError(f"Invalid difficulty level: {difficulty}")
+        session_id = uuid.uuid4().hex
+        version, world = self.worlds.acquire()
+        state = create_game_state(difficulty, world.locations)
+        session = self._attach(session_id, state, world.fork(), version)
+        state.emit('start', location=state.player_location)
+        return session
+
+    def exists(self, session_id):
+        return session_id in self.resident or (session_id.isalnum() and os.path.exists(self._path(session_id)))
+
+    def get(self, session_id):
+        """Return a session, restoring it from disk if it was hibernated"""
+        session = self.resident.get(session_id)
+        if session is not None:
+            session.last_active = time.time()
+            self.resident.move_to_end(session_id)
+            self.hibernate_idle()
+            return session
+
+        self.hibernate_idle()
+        path = self._path(session_id)
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            raise UnknownSession(session_id) from None
+        self.restored += 1
+        version = data['world_version']
+        if version not in self.worlds.worlds:
+            # Pinned version is gone after a restart; resume on the latest
+            version, world = self.worlds.acquire()
+        else:
+            world = self.worlds.worlds[version]
+        return self._attach(session_id, GameStateManager.from_dict(data['state']),
+                            world.fork(data['world']), version)
+
+    def execute(self, session_id, command_input):
+        """Run a command in a session; returns (status, output)
+
+        A session is removed once a command ends its game.
+        """
+        session = self.get(session_id)
+        status, output = session.execute(command_input)
+        if status in FINISHED:
+            session.state.emit_end(status)
+            self.finish(session_id)
+        return status, output
+
+    def finish(self, session_id):
+        """Forget a session whose game is over and release its world version"""
+        session = self.resident.pop(session_id)
+        for path in (self._path(session_id), self._save_path(session_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.worlds.release(session.world_version)
+
+    def reload(self, locations):
+        """Publish new campus content for sessions started from now on"""
+        return self.worlds.publish(locations)
+
+    def hibernate(self, session_id):
+        """Write a resident session to disk and drop it from memory"""
+        session = self.resident.pop(session_id)
+        path = self._path(session_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'w') as f:
+            json.dump(session.to_dict(), f)
+        os.replace(temporary_path, path)
+        self.hibernated += 1
+
+    def hibernate_idle(self, now=None):
+        """Hibernate every session idle for longer than idle_seconds"""
+        cutoff = (now or time.time()) - self.idle_seconds
+        # Least recently used sessions come first, so stop at the first active one
+        while self.resident:
+            session_id, session = next(iter(self.resident.items()))
+            if session.last_active >= cutoff:
+                break
+            self.hibernate(session_id)
+
+    def _evict_overflow(self):
+        while len(self.resident) > self.max_resident:
+            self.hibernate(next(iter(self.resident)))
+
+    def close(self):
+        """Hibernate every resident session"""
+        while self.resident:
+            self.hibernate(next(iter(self.resident)))
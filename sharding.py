@@ -0,0 +1,261 @@
+# Campus Treasure Hunt - sharded multiplayer
+# Splits a shared campus into regions owned by separate worker processes
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import time
+from collections import deque
+
+from game import (GameCommands, GameState, GameStateManager, World,
+                  create_game_state, generate_campus, map_data)
+
+SAVE_DIR = "shard_saves"
+
+def partition_campus(locations, region_count, start='University Entrance'):
+    """Split the campus into contiguous regions of similar size
+
+    Locations are numbered in BFS order over their exits and the order is
+    cut into equal slices, so neighbouring locations mostly share a region.
+    """
+    order = []
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        location_name = queue.popleft()
+        order.append(location_name)
+        for destination in locations[location_name]['EXITS'].values():
+            if destination not in seen:
+                seen.add(destination)
+                queue.append(destination)
+    # Locations not reachable from the start still need an owner
+    order.extend(name for name in locations if name not in seen)
+
+    region_size = max(1, -(-len(order) // region_count))
+    return {name: index // region_size for index, name in enumerate(order)}
+
+class RegionWorld(World):
+    """The part of a campus owned by one worker process
+
+    The worker keeps a full copy of the campus for exits and access checks,
+    but only the locations in its region are authoritative. Views of other
+    regions are rendered by their owner once the session has been handed off.
+    """
+    def __init__(self, locations, owners, region):
+        super().__init__(locations)
+        self.owners = owners
+        self.region = region
+
+    def owns(self, location_name):
+        return self.owners[location_name] == self.region
+
+    def render_location(self, location_name):
+        if not self.owns(location_name):
+            return ""
+        return super().render_location(location_name)
+
+def _run_quietly(action):
+    """Run an action and return its result with everything it printed"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = action()
+    return result, output.getvalue()
+
+def session_save_path(save_dir, session_id):
+    """Where one session's 'save' and 'load' commands keep its game, whichever worker serves it"""
+    return os.path.join(save_dir, f"{session_id}.save.json")
+
+def region_worker(region, locations, owners, inbox, outbox, save_dir=SAVE_DIR):
+    """Serve every session currently standing in one region of the campus"""
+    world = RegionWorld(locations, owners, region)
+    sessions = {}
+
+    while True:
+        batch = inbox.get()
+        if batch is None:
+            break
+
+        replies = []
+        for message in batch:
+            kind, session_id = message[0], message[1]
+            if kind == 'start':
+                state = create_game_state(message[2], locations)
+                sessions[session_id] = GameCommands(state, world, session_save_path(save_dir, session_id))
+                replies.append(('done', session_id, GameState.CONTINUE.value, ""))
+                continue
+
+            if kind == 'adopt':
+                # A session walked in from another region: show where it arrived
+                state_data, status, output = message[2:]
+                commands = GameCommands(GameStateManager.from_dict(state_data), world,
+                                        session_save_path(save_dir, session_id))
+                sessions[session_id] = commands
+                replies.append(('done', session_id, status,
+                                output + world.render_location(commands.state.player_location)))
+                continue
+
+            commands = sessions[session_id]
+            status, output = _run_quietly(lambda: commands.process(message[2]))
+
+            if status in (GameState.WIN, GameState.LOSE, GameState.QUIT):
+                del sessions[session_id]
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(commands.save_path)
+            elif not world.owns(commands.state.player_location):
+                # Hand the session to the worker owning its new location
+                del sessions[session_id]
+                target = owners[commands.state.player_location]
+                replies.append(('handoff', session_id, target, commands.state.to_dict(),
+                                status.value, output))
+                continue
+            replies.append(('done', session_id, status.value, output))
+
+        outbox.put((region, replies))
+
+class ShardedCampus:
+    """A shared campus split across worker processes, one per region
+
+    Commands are sent to workers in batches. Each session has at most one
+    command in flight, and a session that walks across a region boundary
+    is moved to the new owner as a GameStateManager.to_dict() snapshot.
+    Saved games are kept per session in save_dir, so any worker can load
+    them.
+    """
+    def __init__(self, workers=None, locations=None, save_dir=SAVE_DIR):
+        self.locations = map_data if locations is None else locations
+        self.worker_count = workers or os.cpu_count() or 1
+        self.owners = partition_campus(self.locations, self.worker_count)
+        self.outbox = multiprocessing.Queue()
+        self.inboxes = []
+        self.processes = []
+        for region in range(self.worker_count):
+            inbox = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=region_worker,
+                args=(region, self.locations, self.owners, inbox, self.outbox, save_dir),
+                daemon=True
+            )
+            process.start()
+            self.inboxes.append(inbox)
+            self.processes.append(process)
+
+        self.session_regions = {}
+        self.pending = [[] for _ in range(self.worker_count)]
+        self.busy = [False] * self.worker_count
+        self.handoffs = 0
+
+    def start_session(self, session_id, difficulty='normal'):
+        """Queue a new session at the University Entrance"""
+        region = self.owners['University Entrance']
+        self.session_regions[session_id] = region
+        self.pending[region].append(('start', session_id, difficulty))
+
+    def submit(self, session_id, command):
+        """Queue a command for a session that has no command in flight"""
+        region = self.session_regions[session_id]
+        self.pending[region].append(('command', session_id, command))
+
+    def _flush(self):
+        for region, batch in enumerate(self.pending):
+            if batch and not self.busy[region]:
+                self.inboxes[region].put(batch)
+                self.pending[region] = []
+                self.busy[region] = True
+
+    def poll(self):
+        """Wait for one worker batch and return its finished (session, status, output) results"""
+        self._flush()
+        region, replies = self.outbox.get()
+        self.busy[region] = False
+
+        finished = []
+        for reply in replies:
+            if reply[0] == 'handoff':
+                _, session_id, target, state_data, status, output = reply
+                self.session_regions[session_id] = target
+                self.pending[target].append(('adopt', session_id, state_data, status, output))
+                self.handoffs += 1
+            else:
+                _, session_id, status, output = reply
+                finished.append((session_id, GameState(status), output))
+        self._flush()
+        return finished
+
+    def execute(self, session_id, command):
+        """Run one command and wait for its result"""
+        self.submit(session_id, command)
+        while True:
+            for finished_id, status, output in self.poll():
+                if finished_id == session_id:
+                    return status, output
+
+    def run(self, scripts):
+        """Drive many sessions through their command scripts concurrently
+
+        scripts maps a session ID to an iterable of commands. Returns the
+        number of commands executed.
+        """
+        scripts = {session_id: iter(script) for session_id, script in scripts.items()}
+        in_flight = 0
+        executed = 0
+        for session_id in scripts:
+            self.start_session(session_id)
+            in_flight += 1
+
+        while in_flight:
+            for session_id, status, output in self.poll():
+                in_flight -= 1
+                command = None
+                if status not in (GameState.WIN, GameState.LOSE, GameState.QUIT):
+                    command = next(scripts[session_id], None)
+                if command is not None:
+                    self.submit(session_id, command)
+                    executed += 1
+                    in_flight += 1
+        return executed
+
+    def close(self):
+        """Stop all worker processes"""
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for process in self.processes:
+            process.join()
+
+def random_script(length, seed):
+    """A random walk drifting away from the entrance, so players spread over all regions"""
+    rng = random.Random(seed)
+    script = ['take student_card', 'use student_card']
+    for _ in range(length):
+        roll = rng.random()
+        if roll < 0.7:
+            script.append('go ' + rng.choice(['north', 'south', 'south', 'east', 'east', 'west']))
+        elif roll < 0.9:
+            script.append('look')
+        else:
+            script.append('inventory')
+    return script
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a campus sharded across worker processes")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--size', type=int, default=30, help="generated campus is size x size blocks")
+    parser.add_argument('--players', type=int, default=1000)
+    parser.add_argument('--commands', type=int, default=100, help="commands per player")
+    args = parser.parse_args()
+
+    campus = ShardedCampus(args.workers, generate_campus(args.size, args.size))
+    scripts = {f"player-{i}": random_script(args.commands, i) for i in range(args.players)}
+    started = time.perf_counter()
+    executed = campus.run(scripts)
+    elapsed = time.perf_counter() - started
+    campus.close()
+
+    print(f"Workers: {args.workers}")
+    print(f"Commands: {executed} in {elapsed:.2f} seconds ({executed / elapsed:.0f} commands/second)")
+    print(f"Region handoffs: {campus.handoffs}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+# Campus Treasure Hunt - difficulty calibration
+# Plays large numbers of bot games on a virtual clock to measure how hard each difficulty is
+
+import argparse
+import contextlib
+import math
+import os
+import random
+import time
+from collections import Counter, defaultdict, deque
+from multiprocessing import Pool
+
+import game
+from analytics import distribution
+from game import (DIFFICULTY_LEVELS, GameCommands, GameState, World,
+                  create_game_state, generate_campus, map_data)
+
+MAX_COMMANDS = 500
+SECONDS_PER_COMMAND = 8.0
+GAMES_PER_TASK = 200
+
+class VirtualClock:
+    """A clock that only moves when the simulation advances it"""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+class NullOutput:
+    """Swallows everything the game prints"""
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+def first_step_towards(locations, state, start, is_target):
+    """Return the direction of the first move on a shortest path to a target location"""
+    queue = deque([start])
+    first_steps = {start: None}
+    while queue:
+        location_name = queue.popleft()
+        if location_name != start and is_target(location_name):
+            return first_steps[location_name]
+        for direction, destination in locations[location_name]['EXITS'].items():
+            if destination in first_steps:
+                continue
+            required = locations[destination].get('ACCESS_CONTROL', {}).get('required_items', [])
+            if all(item in state.player_inventory for item in required):
+                first_steps[destination] = first_steps[location_name] or direction
+                queue.append(destination)
+    return None
+
+class RandomWalkBot:
+    """Wanders through random exits and sometimes picks things up"""
+    def __init__(self, rng):
+        self.rng = rng
+
+    def next_command(self, commands):
+        state = commands.state
+        items_here = commands.world.locations[state.player_location]['ITEMS']
+        if items_here and self.rng.random() < 0.5:
+            return 'take ' + self.rng.choice(items_here)
+        if 'student_card' in state.player_inventory and not state.has_entered_campus:
+            return 'use student_card'
+        exits = list(commands.world.locations[state.player_location]['EXITS'])
+        return 'go ' + self.rng.choice(exits)
+
+class GreedyBot:
+    """Takes everything in sight and heads for the nearest unexplored or unlooted location"""
+    def __init__(self, rng):
+        self.rng = rng
+
+    def next_command(self, commands):
+        state = commands.state
+        locations = commands.world.locations
+        items_here = locations[state.player_location]['ITEMS']
+        if items_here:
+            return 'take ' + items_here[0]
+        if 'student_card' in state.player_inventory and not state.has_entered_campus:
+            return 'use student_card'
+
+        direction = first_step_towards(
+            locations, state, state.player_location,
+            lambda name: locations[name]['ITEMS'] or name not in state.visited_locations
+        )
+        if direction is None:
+            direction = self.rng.choice(list(locations[state.player_location]['EXITS']))
+        return 'go ' + direction
+
+class HintFollowerBot(GreedyBot):
+    """Buys a hint, then heads for the location named by the latest clue it has read"""
+    def __init__(self, rng):
+        super().__init__(rng)
+        self.asked_for_hint = False
+        self.searched = set()
+
+    def revealed_clues(self, state):
+        hints = state.hint_system.hints
+        clues = [hints[1]] if self.asked_for_hint else []
+        clues.extend(hints[n] for n in range(2, 2 + min(state.hint_system.mysterious_note_used, 2)))
+        return clues
+
+    def next_command(self, commands):
+        state = commands.state
+        locations = commands.world.locations
+        if not self.asked_for_hint and state.remaining_hints > 0:
+            self.asked_for_hint = True
+            return 'hint'
+        if 'mysterious_note' in state.player_inventory:
+            return 'use mysterious_note'
+
+        target = None
+        for clue in reversed(self.revealed_clues(state)):
+            named = [name for name in locations if name.lower() in clue.lower() and name not in self.searched]
+            if named:
+                target = named[0]
+                break
+
+        if target == state.player_location:
+            items_here = locations[target]['ITEMS']
+            for item in ('COMP9001 notes', 'mysterious_note'):
+                if item in items_here:
+                    return 'take ' + item
+            self.searched.add(target)
+        elif target is not None:
+            direction = first_step_towards(locations, state, state.player_location, lambda name: name == target)
+            if direction is not None:
+                return 'go ' + direction
+        return super().next_command(commands)
+
+POLICIES = {
+    'random': RandomWalkBot,
+    'greedy': GreedyBot,
+    'hints': HintFollowerBot
+}
+
+class Results:
+    """Outcome, step, time and score histograms for one difficulty and policy"""
+    def __init__(self):
+        self.outcomes = Counter()
+        self.commands = 0
+        self.steps = Counter()
+        self.seconds = Counter()
+        self.scores = Counter()
+
+    def merge(self, other):
+        self.outcomes.update(other.outcomes)
+        self.commands += other.commands
+        self.steps.update(other.steps)
+        self.seconds.update(other.seconds)
+        self.scores.update(other.scores)
+        return self
+
+def play_bot_game(base_world, difficulty, policy, rng, virtual_clock, max_commands, seconds_per_command):
+    """Play one game with a bot; returns (outcome, commands issued, state)"""
+    world = base_world.fork()
+    state = create_game_state(difficulty, world.locations)
+    commands = GameCommands(state, world)
+    bot = POLICIES[policy](rng)
+
+    for issued in range(max_commands):
+        if state.time_is_up():
+            return 'timeout', issued, state
+        status = commands.process(bot.next_command(commands))
+        virtual_clock.advance(rng.expovariate(1 / seconds_per_command))
+        if status == GameState.WIN:
+            return 'win', issued + 1, state
+    return 'gave up', max_commands, state
+
+def _apply_overrides(overrides):
+    for difficulty, settings in overrides.items():
+        DIFFICULTY_LEVELS[difficulty].update(settings)
+
+def run_task(task):
+    """Simulate a chunk of games for one difficulty and policy in a worker"""
+    (difficulty, policy, first_seed, games, campus_size,
+     max_commands, seconds_per_command, overrides) = task
+    _apply_overrides(overrides)
+    virtual_clock = VirtualClock()
+    game.clock = virtual_clock
+    base_world = World(generate_campus(campus_size, campus_size) if campus_size else map_data)
+
+    results = Results()
+    with contextlib.redirect_stdout(NullOutput()):
+        for seed in range(first_seed, first_seed + games):
+            rng = random.Random(seed)
+            virtual_clock.now = 0.0
+            outcome, issued, state = play_bot_game(base_world, difficulty, policy, rng, virtual_clock,
+                                                   max_commands, seconds_per_command)
+            results.outcomes[outcome] += 1
+            results.commands += issued
+            results.steps[state.steps_taken] += 1
+            results.seconds[int(virtual_clock.now)] += 1
+            results.scores[state.final_score()] += 1
+    return difficulty, policy, results
+
+def simulate(games, difficulties, policies, processes=None, campus_size=0,
+             max_commands=MAX_COMMANDS, seconds_per_command=SECONDS_PER_COMMAND, overrides=None):
+    """Simulate games per difficulty and policy across worker processes"""
+    tasks = []
+    for difficulty in difficulties:
+        for policy in policies:
+            for first_seed in range(0, games, GAMES_PER_TASK):
+                tasks.append((difficulty, policy, first_seed, min(GAMES_PER_TASK, games - first_seed),
+                              campus_size, max_commands, seconds_per_command, overrides or {}))
+
+    totals = defaultdict(Results)
+    with Pool(processes) as pool:
+        for difficulty, policy, results in pool.imap_unordered(run_task, tasks):
+            totals[(difficulty, policy)].merge(results)
+    return totals
+
+def score_spread(histogram):
+    total = sum(histogram.values())
+    mean = sum(score * count for score, count in histogram.items()) / total
+    variance = sum(count * (score - mean) ** 2 for score, count in histogram.items()) / total
+    return mean, math.sqrt(variance)
+
+def print_results(totals, elapsed):
+    commands = sum(results.commands for results in totals.values())
+    print(f"Simulated {commands} commands in {elapsed:.1f} seconds "
+          f"({commands / elapsed * 60:,.0f} commands/minute)")
+    for (difficulty, policy), results in sorted(totals.items()):
+        games = sum(results.outcomes.values())
+        settings = DIFFICULTY_LEVELS[difficulty]
+        print(f"\n{difficulty} (time limit {settings['time_limit']}s, {settings['hints']} hints), {policy} bot, {games} games:")
+        print("  Outcomes: " + ", ".join(f"{outcome} {count / games:.1%}"
+                                         for outcome, count in results.outcomes.most_common()))
+        for name, histogram in (('Steps', results.steps), ('Seconds', results.seconds)):
+            summary = distribution(histogram)
+            print(f"  {name}: mean {summary['mean']:.1f}, p50 {summary['p50']}, "
+                  f"p90 {summary['p90']}, p99 {summary['p99']}")
+        mean, deviation = score_spread(results.scores)
+        summary = distribution(results.scores)
+        print(f"  Final score: mean {mean:.0f}, std {deviation:.0f}, "
+              f"min {summary['min']}, p50 {summary['p50']}, max {summary['max']}")
+
+def parse_override(text, key, convert):
+    """Parse a 'difficulty=value' option into {difficulty: {key: value}}"""
+    difficulty, _, value = text.partition('=')
+    if difficulty not in DIFFICULTY_LEVELS or not value:
+        raise argparse.ArgumentTypeError(f"expected difficulty=value, got '{text}'")
+    return difficulty, {key: convert(value)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate difficulty levels with simulated bot players")
+    parser.add_argument('--games', type=int, default=1000, help="games per difficulty and policy")
+    parser.add_argument('--difficulty', nargs='+', default=list(DIFFICULTY_LEVELS), choices=list(DIFFICULTY_LEVELS))
+    parser.add_argument('--policy', nargs='+', default=list(POLICIES), choices=list(POLICIES))
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--campus-size', type=int, default=0, help="use a generated N x N campus")
+    parser.add_argument('--max-commands', type=int, default=MAX_COMMANDS, help="commands before a bot gives up")
+    parser.add_argument('--seconds-per-command', type=float, default=SECONDS_PER_COMMAND,
+                        help="mean virtual time a player spends per command")
+    parser.add_argument('--time-limit', action='append', default=[], metavar='DIFFICULTY=SECONDS',
+                        type=lambda text: parse_override(text, 'time_limit', int))
+    parser.add_argument('--hints', action='append', default=[], metavar='DIFFICULTY=N',
+                        type=lambda text: parse_override(text, 'hints', int))
+    args = parser.parse_args()
+
+    overrides = defaultdict(dict)
+    for difficulty, settings in args.time_limit + args.hints:
+        overrides[difficulty].update(settings)
+    _apply_overrides(overrides)
+
+    started = time.perf_counter()
+    totals = simulate(args.games, args.difficulty, args.policy, args.processes, args.campus_size,
+                      args.max_commands, args.seconds_per_command, dict(overrides))
+    print_results(totals, time.perf_counter() - started)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Campus Treasure Hunt - live spectator feed
+# Fans the events of server sessions out to any number of watchers
+
+import asyncio
+import json
+from collections import deque
+
+import game
+
+SUBSCRIBER_QUEUE = 256  # Events a watcher may fall behind before it is dropped
+KEEPALIVE_SECONDS = 15
+
+class Subscriber:
+    """One watcher's bounded queue of encoded events"""
+    def __init__(self, session_id=None, limit=SUBSCRIBER_QUEUE):
+        self.session_id = session_id  # None watches every session
+        self.limit = limit
+        self.frames = deque()
+        self.ready = asyncio.Event()
+        self.dropped = False
+        self.closed = False
+
+    def push(self, frame):
+        """Queue an encoded event; returns False once the watcher has fallen too far behind"""
+        if len(self.frames) >= self.limit:
+            self.dropped = True
+        else:
+            self.frames.append(frame)
+        self.ready.set()
+        return not self.dropped
+
+    def close(self):
+        """End the stream once the queued events are written"""
+        self.closed = True
+        self.ready.set()
+
+    async def next_frames(self, timeout):
+        """Wait for queued events and take them all; an empty list means the wait timed out"""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self.ready.clear()
+        frames = list(self.frames)
+        self.frames.clear()
+        return frames
+
+class Broadcaster:
+    """Publishes session events to the watchers of that session and of the whole cohort
+
+    Each event is encoded once and the same bytes are queued for every
+    watcher, and nothing is encoded while nobody is watching. Publishing
+    never waits on a watcher: one whose queue fills up is dropped.
+    """
+    def __init__(self, limit=SUBSCRIBER_QUEUE):
+        self.limit = limit
+        self.watchers = {}  # session ID, or None for the whole cohort -> subscribers
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, session_id=None):
+        """Start watching one session, or every session when session_id is None"""
+        subscriber = Subscriber(session_id, self.limit)
+        self.watchers.setdefault(session_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        watchers = self.watchers.get(subscriber.session_id)
+        if watchers is not None:
+            watchers.discard(subscriber)
+            if not watchers:
+                del self.watchers[subscriber.session_id]
+
+    def publish(self, session_id, state, event, details):
+        """Session event listener; SessionManager binds the session ID"""
+        session_watchers = self.watchers.get(session_id, ())
+        cohort_watchers = self.watchers.get(None, ())
+        if session_watchers or cohort_watchers:
+            record = {
+                'ts': round(game.clock(), 3),
+                'session': session_id,
+                'difficulty': state.difficulty,
+                'event': event
+            }
+            record.update(details)
+            frame = f"event: {event}\ndata: {json.dumps(record)}\n\n".encode()
+            self.published += 1
+            slow = [subscriber for watchers in (session_watchers, cohort_watchers)
+                    for subscriber in watchers if not subscriber.push(frame)]
+            for subscriber in slow:
+                self.dropped += 1
+                self.unsubscribe(subscriber)
+        if event == 'end':
+            for subscriber in self.watchers.pop(session_id, ()):
+                subscriber.close()
+
+    def status(self):
+        return {
+            'watchers': {session_id or '*': len(watchers) for session_id, watchers in self.watchers.items()},
+            'published': self.published,
+            'dropped': self.dropped
+        }
+
+async def stream(subscriber, writer, keepalive=KEEPALIVE_SECONDS):
+    """Write a subscriber's events as Server-Sent Events until it is closed or dropped"""
+    while True:
+        frames = await subscriber.next_frames(keepalive)
+        if subscriber.dropped:
+            writer.write(b"event: dropped\ndata: {}\n\n")
+            return
+        writer.write(b"".join(frames) if frames else b": keepalive\n\n")
+        try:
+            # A watcher that stops reading is dropped here too
+            await asyncio.wait_for(writer.drain(), keepalive)
+        except asyncio.TimeoutError:
+            subscriber.dropped = True
+            return
+        if subscriber.closed:
+            return